@@ -90,13 +90,13 @@ import os
 import sys
 import glob
 import subprocess
+import concurrent.futures as futures
 import numpy as np
 from pathlib import Path
 from rdkit.Chem import AllChem as Chem
 from rdkit.Chem import Descriptors as Descriptors
 from rdkit.Chem.PropertyMol import PropertyMol
 from progress.bar import IncrementalBar
-from rdkit.Geometry import Point3D
 import time
 from aqme.utils import (
     load_variables,
@@ -104,7 +104,8 @@ from aqme.utils import (
     add_prefix_suffix,
     check_xtb,
     check_dependencies,
-    set_destination
+    set_destination,
+    read_sdf_tags
 )
 from aqme.filter import conformer_filters
 from aqme.csearch.crest import xtb_opt_main
@@ -144,6 +145,9 @@ class cmin:
         if self.args.nprocs is None:
             self.args.nprocs = 1
 
+        # the ANI model is only loaded once (in get_cmin_model()) and reused for all the conformers
+        self.cmin_model = None
+
         # check if xTB is installed
         if self.args.program.lower() == "xtb":
             _ = check_xtb(self)
@@ -167,19 +171,30 @@ class cmin:
                 files_temp_extra = glob.glob('*.xyz')
             files_cmin = glob.glob('*.sdf')
         elif file_format.lower() == 'pdb':
-            for file in self.args.files:
-                command_pdb = [
-                    "obabel",
-                    "-ipdb",
-                    f"{file}",
-                    "-osdf",
-                    f"-O{file.split('.pdb')[0]}.sdf",
-                ]
-                subprocess.run(
-                    command_pdb,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                )
+            # obabel runs out-of-process, so the PDB to SDF conversions can overlap
+            pdb_jobs = []
+            with futures.ThreadPoolExecutor(
+                max_workers=self.args.nprocs,
+            ) as executor:
+                for file in self.args.files:
+                    command_pdb = [
+                        "obabel",
+                        "-ipdb",
+                        f"{file}",
+                        "-osdf",
+                        f"-O{file.split('.pdb')[0]}.sdf",
+                    ]
+                    pdb_jobs.append(
+                        executor.submit(
+                            subprocess.run,
+                            command_pdb,
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL,
+                        )
+                    )
+                # result() raises the errors from the conversions (i.e. obabel not found)
+                for pdb_job in pdb_jobs:
+                    pdb_job.result()
             files_cmin = glob.glob('*.sdf')
         elif file_format.lower() == 'sdf':
             files_cmin = self.args.files
@@ -274,18 +289,11 @@ class cmin:
             if file_format.lower() == 'sdf':
                 if self.args.charge is None or self.args.mult is None:
                     # read charge and mult from SDF if possible (i.e. charge/mult of SDFs created with CSEARCH)
-                    with open(file, "r") as F:
-                        lines = F.readlines()
-                    charge_found, mult_found = False, False
-                    for i, line in enumerate(lines):
-                        if line.find(">  <Real charge>") > -1:
-                            charge_input = lines[i + 1].split()[0]
-                            charge_found = True
-                        if line.find(">  <Mult>") > -1:
-                            mult_input = lines[i + 1].split()[0]
-                            mult_found = True
-                        if charge_found and mult_found:
-                            break
+                    sdf_tags = read_sdf_tags(file, ["Real charge", "Mult"])
+                    if len(sdf_tags["Real charge"]) > 0:
+                        charge_input = sdf_tags["Real charge"][0].split()[0]
+                    if len(sdf_tags["Mult"]) > 0:
+                        mult_input = sdf_tags["Mult"][0].split()[0]
             if self.args.charge is None and charge_input is None:
                 # if no charge/mult was specified or found, the charge is calculated using the mol object
                 charge = 0
@@ -306,7 +314,8 @@ class cmin:
             if mol is not None:
                 # ANI calculations use ASE to run
                 if self.args.program.lower() == "ani":
-                    mol, energy, cmin_valid = self.ani_optimize(mol,charge,mult)
+                    mol, cmin_valid = self.ani_optimize(mol,charge,mult)
+                    energy = None
                 # xTB calculations use the xTB program directly
                 elif self.args.program.lower() == "xtb":
                     # for contrained optimizations
@@ -335,10 +344,17 @@ class cmin:
                     outmols.append(pmol)
                     cenergy.append(energy)
 
+        # the ANI energies of all the optimized conformers are computed together
+        if self.args.program.lower() == "ani" and len(outmols) >= 1:
+            cenergy = self.ani_energies(outmols)
+
         if len(cenergy) >= 1:
             # if SQM energy exists, overwrite RDKit energies and geometries
-            cids = list(range(len(outmols)))
-            sorted_all_cids = sorted(cids, key=lambda cid: cenergy[cid])
+            sorted_all_cids = np.argsort(cenergy, kind="stable").tolist()
+
+            # the atomic charges only depend on the input mol, so the total charge is summed once
+            if self.args.program.lower() == "ani":
+                total_charge = str(np.sum(charge))
 
             for cid in sorted_all_cids:
                 outmols[cid].SetProp(
@@ -346,7 +362,7 @@ class cmin:
                 )
                 outmols[cid].SetProp("Energy", cenergy[cid])
                 if self.args.program.lower() == "ani":
-                    outmols[cid].SetProp("Real charge", str(np.sum(charge)))
+                    outmols[cid].SetProp("Real charge", total_charge)
                     outmols[cid].SetProp("Mult", str(final_mult))
                 elif self.args.program.lower() == "xtb":
                     outmols[cid].SetProp("Real charge", str(charge))
@@ -386,7 +402,7 @@ class cmin:
         self.args.log.write(f"\no  Starting ANI optimization")
 
         os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
-        DEVICE = torch.device("cpu")
+        DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
         # if a large system is used, you might need to increase the stack size
         os.environ["OMP_STACKSIZE"] = self.args.stacksize
@@ -395,16 +411,14 @@ class cmin:
         for _, atom in enumerate(mol.GetAtoms()):
             elements += atom.GetSymbol()
 
-        cartesians = mol.GetConformers()[0].GetPositions()
-        coordinates = torch.tensor(
-            [cartesians.tolist()], requires_grad=True, device=DEVICE
-        )
+        # ASE takes the NumPy array of positions directly
+        cartesians = mol.GetConformer().GetPositions()
         cmin_valid = True
-        model = self.get_cmin_model()
+        model = self.get_cmin_model(DEVICE)
 
         # define ase molecule using ANI calculator
         ase_molecule = ase.Atoms(
-            elements, positions=coordinates.tolist()[0], calculator=model.ase()
+            elements, positions=cartesians, calculator=model.ase()
         )
 
         # Adjust charge and multiplicity from the input SDFs
@@ -413,8 +427,9 @@ class cmin:
             atom.charge = charge[i]
             atom.magmom = mult[i]
 
+        # no trajectory is written, the number of steps is taken from the optimizer
         optimizer = ase.optimize.BFGS(
-            ase_molecule, trajectory="cmin_opt.traj", logfile="cmin.opt"
+            ase_molecule, logfile="cmin.opt"
         )
         try:
             optimizer.run(fmax=self.args.opt_fmax, steps=self.args.opt_steps)
@@ -422,38 +437,65 @@ class cmin:
         except KeyError:
             self.args.log.write(f"\nx  {self.args.ani_method} could not optimize this molecule (i.e. check if all the atoms used are compatible with ANI)")
             cmin_valid = False
-            energy = 0
 
         if cmin_valid:
-            if len(ase.io.Trajectory("cmin_opt.traj", mode="r")) != (self.args.opt_steps + 1):
-                species_coords = ase_molecule.get_positions().tolist()
-                coordinates = torch.tensor(
-                    [species_coords], requires_grad=True, device=DEVICE
-                )
+            if optimizer.nsteps != self.args.opt_steps:
+                cartesians = ase_molecule.get_positions()
 
-            # compute energy:
-            species = model.species_to_tensor(elements).to(DEVICE).unsqueeze(0)
-            _, ani_energy = model((species, coordinates))
-            energy = ani_energy.item() * hartree_to_kcal  # Hartree to kcal/mol
+            # update coordinates of mol object (the energies are computed later in ani_energies())
+            # (this RDKit version has no bulk setter, the conformer is retrieved once and
+            # SetAtomPosition() takes the xyz lists without creating Point3D objects)
+            conformer = mol.GetConformer()
+            for j, xyz in enumerate(cartesians.tolist()):
+                conformer.SetAtomPosition(j, xyz)
 
-            # update coordinates of mol object
-            cartesians = np.array(coordinates.tolist()[0])
-            for j in range(mol.GetNumAtoms()):
-                [x, y, z] = cartesians[j]
-                mol.GetConformer().SetAtomPosition(j, Point3D(x, y, z))
+        return mol, cmin_valid
+
+    def ani_energies(self, mols):
+        """
+        Computes the ANI energies (in kcal/mol) of the optimized conformers. Conformers with
+        the same atoms are stacked into one batch, so the model runs once per batch
+        """
+
+        import torch
+
+        DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model = self.get_cmin_model(DEVICE)
+
+        batches = {}
+        for i, mol in enumerate(mols):
+            elements = "".join(atom.GetSymbol() for atom in mol.GetAtoms())
+            batches.setdefault(elements, []).append(i)
+
+        energies = [None] * len(mols)
+        for elements, idx_batch in batches.items():
+            species = model.species_to_tensor(elements).to(DEVICE).unsqueeze(0).repeat(len(idx_batch), 1)
+            coordinates = torch.tensor(
+                np.array([mols[i].GetConformer().GetPositions() for i in idx_batch]),
+                dtype=torch.float32,
+                device=DEVICE
+            )
+            # energies only (no gradients), kept in FP32 since reduced precision formats can't
+            # resolve kcal/mol differences in total energies of hundreds of Hartree
+            with torch.inference_mode():
+                _, ani_energy = model((species, coordinates))
+            for i, energy in zip(idx_batch, ani_energy.tolist()):
+                energies[i] = energy * hartree_to_kcal  # Hartree to kcal/mol
 
-        return mol, energy, cmin_valid
+        return energies
 
     # generate the CMIN optimization model
-    def get_cmin_model(self):
+    def get_cmin_model(self, device):
         """
-        Function to generate the optimization model for CMIN (using xTB or ANI methods)
+        Function to generate the optimization model for CMIN (using ANI methods). The model
+        is created only once per CMIN run and placed on the device used (GPU if available)
         """
 
-        import torchani
-        model = getattr(torchani.models,self.args.ani_method)()
+        if self.cmin_model is None:
+            import torchani
+            self.cmin_model = getattr(torchani.models,self.args.ani_method)().to(device)
 
-        return model
+        return self.cmin_model
 
     # write SDF files for xTB and ANI
     def write_confs(self, conformers, selectedcids, log):
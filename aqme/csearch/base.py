@@ -190,7 +190,9 @@ import time
 import shutil
 import subprocess
 import glob
+import itertools
 import concurrent.futures as futures
+import numpy as np
 from pathlib import Path
 from progress.bar import IncrementalBar
 
@@ -213,6 +215,7 @@ from aqme.csearch.utils import (
     prepare_sdf_files,
     prepare_pdb_files,
     minimize_rdkit_energy,
+    minimize_rdkit_confs,
     com_2_xyz,
     check_constraints,
     smi_to_mol,
@@ -220,7 +223,7 @@ from aqme.csearch.utils import (
     substituted_mol
     )
 from aqme.csearch.templates import template_embed, check_metal_neigh
-from aqme.csearch.fullmonte import generating_conformations_fullmonte, realign_mol
+from aqme.csearch.fullmonte import generating_conformations_fullmonte, realign_mol, get_realign_constraints
 from aqme.utils import (
     load_variables,
     set_metal_atomic_number,
@@ -235,6 +238,12 @@ from aqme.utils import (
 from aqme.csearch.crest import xtb_opt_main
 
 
+# metal atoms detected automatically in CSEARCH
+TRANSITION_METALS = frozenset(['Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Y', 'Zr', 'Nb', 'Mo',
+                               'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au',
+                               'Hg', 'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og'])
+
+
 class csearch:
     """
     Class absracting the geometry generation and conformational search procedure.
@@ -308,6 +317,11 @@ class csearch:
                 self.args.log.finalize()
                 sys.exit()
 
+        # the destination folder is shared by all the jobs, so it is set up once here instead
+        # of inside compute_confs() (avoids race conditions between the threads of run_csearch)
+        self.csearch_folder = set_destination(self,'CSEARCH')
+        self.csearch_folder.mkdir(exist_ok=True, parents=True)
+
         for csearch_file in csearch_files:
             # load jobs for conformer generation
             if self.args.smi is not None:
@@ -474,10 +488,6 @@ class csearch:
             # check if the optimization is constrained
             complex_ts = check_constraints(self)
 
-        self.csearch_folder = set_destination(self,'CSEARCH')
-
-        self.csearch_folder.mkdir(exist_ok=True, parents=True)
-
         # for 3D input types
         if self.args.program.lower() in ["crest"] and self.args.smi is None:
             if os.path.basename(Path(self.args.input)).split(".")[-1] in ["pdb", "mol2", "mol", "sdf"]:
@@ -607,12 +617,10 @@ class csearch:
     # automatic detection of metal atoms   
     def find_metal_atom(self,mol,charge,mult,name):
         metal_atoms = [] # for batch jobs such as CSV inputs with many SMILES
-        transition_metals = ['Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Y', 'Zr', 'Nb', 'Mo',
-                            'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au',
-                            'Hg', 'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og']
         for atom in mol.GetAtoms():
-            if atom.GetSymbol() in transition_metals:
-                metal_atoms.append(atom.GetSymbol())
+            symbol = atom.GetSymbol()
+            if symbol in TRANSITION_METALS:
+                metal_atoms.append(symbol)
         if len(metal_atoms) > 0:
             self.args.log.write(f"\no  AQME recognized the following metal atoms: {metal_atoms} ({os.path.basename(Path(name))})")
             if charge is None:
@@ -813,9 +821,10 @@ class csearch:
             # reads the initial SDF files from RDKit and uses dihedral scan if selected
             if status not in [-1, 0]:
                 # getting the energy and mols after rotations
+                # (with SUMM, mol_crest contains the initial conformers and their rotamers)
                 if self.args.program.lower() == "summ" and len(rotmatches) != 0:
                     status = self.dihedral_filter_and_sdf(
-                        name, csearch_file, coord_Map, 
+                        name, csearch_file, mol_crest, coord_Map, 
                         alg_Map, mol_template, ff, metal_atoms, metal_idx, metal_sym
                     )
 
@@ -889,21 +898,26 @@ class csearch:
         return status
 
     def dihedral_filter_and_sdf(
-        self, name, csearch_file, coord_Map, alg_Map, 
+        self, name, csearch_file, rdmols, coord_Map, alg_Map, 
         mol_template, ff, metal_atoms, metal_idx, metal_sym
     ):
         """
-        Filtering after dihedral scan to sdf
+        Filtering after dihedral scan to sdf (rdmols are the mols generated
+        in min_after_embed(), so they don't need to be read from the SDF file)
         """
 
         rotated_energy = []
-        # apply filters
-        rdmols = load_sdf(csearch_file)
+
+        # all the rotamers share the same connectivity, so the MMFF atom typing is done only once
+        mmff_props = None
+        if ff.upper() == "MMFF" and len(rdmols) > 0:
+            mmff_props = Chem.MMFFGetMoleculeProperties(rdmols[0])
 
         for i, rd_mol_i in enumerate(rdmols):
             if coord_Map is None and alg_Map is None and mol_template is None:
                 energy = minimize_rdkit_energy(
-                    rd_mol_i, -1, self.args.log, ff, self.args.opt_steps_rdkit
+                    rd_mol_i, -1, self.args.log, ff, self.args.opt_steps_rdkit,
+                    mmff_props=mmff_props
                 )
             else:
                 rd_mol_i, energy = realign_mol(
@@ -916,8 +930,8 @@ class csearch:
                 )
             rotated_energy.append(energy)
 
-        rotated_cids = list(range(len(rdmols)))
-        sorted_rotated_cids = sorted(rotated_cids, key=lambda cid: rotated_energy[cid])
+        # stable sort, the same order as sorted() for conformers with equal energies
+        sorted_rotated_cids = np.argsort(rotated_energy, kind="stable").tolist()
 
         # filter based on energy window ewin_csearch
         selectedcids_rotated = conformer_filters(self,sorted_rotated_cids,rotated_energy,rdmols)
@@ -935,7 +949,6 @@ class csearch:
             mol_select.append(mol_rd) 
 
         # update SDF file
-        os.remove(csearch_file)
         sdwriter_upd = Chem.SDWriter(f'{csearch_file}')
         for mol in mol_select:
             sdwriter_upd.write(mol)
@@ -1002,12 +1015,15 @@ class csearch:
         metal_atoms,
         metal_idx,
         metal_sym,
-        ff
+        ff,
+        mmff_props=None,
+        rotamers=None
     ):
         """
         If program = RDKit, this replaces iodine back to the metal (if needed) 
         and writes the RDKit SDF files. With program = summ, this function 
-        optimizes rotamers
+        optimizes rotamers (stored in the rotamers list when it's used, instead of
+        writing them to the SDF file)
         """
 
         if i >= len(matches):  # base case, torsions should be set in conf
@@ -1020,6 +1036,7 @@ class csearch:
                             self.args.log,
                             ff,
                             self.args.opt_steps_rdkit,
+                            mmff_props=mmff_props
                         )
                     else:
                         mol, energy = realign_mol(
@@ -1040,7 +1057,10 @@ class csearch:
                         if original_atn is not None:
                             mol.GetAtomWithIdx(original_atn[1]).SetAtomicNum(original_atn[0])
             
-            sdwriter.write(mol, conf)
+            if rotamers is not None:
+                rotamers.append(Chem.Mol(mol, confId=conf))
+            else:
+                sdwriter.write(mol, conf)
             return 1
 
         elif self.args.program.lower() in ["crest"]:
@@ -1050,19 +1070,28 @@ class csearch:
 
             return 1
 
-        # when SUMM is selected, this cycle generates conformers based on rotation of dihedral angles
+        # when SUMM is selected, this cycle generates conformers based on rotation of dihedral angles.
+        # All the combinations of angles are visited in a flat loop (instead of recursing once per
+        # dihedral), and only the dihedrals that changed from the previous combination are set
         total = 0
-        deg = 0
-        while deg < 360.0:
-            rad = math.pi * deg / 180.0
-            rdMolTransforms.SetDihedralRad(
-                mol.GetConformer(conf), *matches[i], value=rad
-            )
+        angles = range(0, 360, int(self.args.degree))
+        previous_degs = None
+        for degs in itertools.product(angles, repeat=len(matches) - i):
+            first_changed = 0
+            if previous_degs is not None:
+                first_changed = next(k for k, (deg, prev_deg) in enumerate(zip(degs, previous_degs)) if deg != prev_deg)
+            for k in range(first_changed, len(degs)):
+                rad = math.pi * degs[k] / 180.0
+                rdMolTransforms.SetDihedralRad(
+                    mol.GetConformer(conf), *matches[i + k], value=rad
+                )
+            previous_degs = degs
             mol.SetProp("_Name", name)
+            # write the conformer with all the dihedrals set (base case)
             total += self.genConformer_r(
                 mol,
                 conf,
-                i + 1,
+                len(matches),
                 matches,
                 name,
                 sdwriter,
@@ -1075,9 +1104,10 @@ class csearch:
                 metal_atoms,
                 metal_idx,
                 metal_sym,
-                ff
+                ff,
+                mmff_props=mmff_props,
+                rotamers=rotamers
             )
-            deg += int(self.args.degree)
 
         return total
 
@@ -1095,22 +1125,23 @@ class csearch:
         if is_sdf_mol_or_mol2:
             Chem.AssignStereochemistryFrom3D(mol)
 
-        embed_kwargs = dict()
-        embed_kwargs["ignoreSmoothingFailures"] = True
-        embed_kwargs["randomSeed"] = self.args.seed
-        embed_kwargs["numThreads"] = csearch_nprocs
+        # ETKDGv3 (torsion and small ring preferences) gives better starting geometries for
+        # the RDKit minimization that follows
+        embed_params = rdDistGeom.ETKDGv3()
+        embed_params.ignoreSmoothingFailures = True
+        embed_params.randomSeed = self.args.seed
+        embed_params.numThreads = csearch_nprocs
 
         if (coord_Map, alg_Map, mol_template) != (None, None, None):
-            embed_kwargs["coordMap"] = coord_Map
-        cids = rdDistGeom.EmbedMultipleConfs(mol, initial_confs, **embed_kwargs)
+            embed_params.SetCoordMap(coord_Map)
+        cids = rdDistGeom.EmbedMultipleConfs(mol, initial_confs, embed_params)
 
         if len(cids) <= 1 and initial_confs != 1:
             self.args.log.write(f"\nx  Normal RDKit embeding process failed, trying to generate conformers with random coordinates (with {str(initial_confs)} possibilities) ({os.path.basename(Path(name))})")
-            embed_kwargs["useRandomCoords"] = True
-            embed_kwargs["boxSizeMult"] = 10.0
-            embed_kwargs["numZeroFail"] = 1000
-            embed_kwargs["numThreads"] = csearch_nprocs
-            cids = rdDistGeom.EmbedMultipleConfs(mol, initial_confs, **embed_kwargs)
+            embed_params.useRandomCoords = True
+            embed_params.boxSizeMult = 10.0
+            embed_params.numZeroFail = 1000
+            cids = rdDistGeom.EmbedMultipleConfs(mol, initial_confs, embed_params)
 
         if is_sdf_mol_or_mol2:
             # preserving AssignStereochemistryFrom3D
@@ -1120,18 +1151,35 @@ class csearch:
         return cids
 
     def min_and_E_calc(self, mol, cids, coord_Map, alg_Map, mol_template, 
-                       ff, geom, metal_atoms, metal_idx, metal_sym):
+                       ff, geom, metal_atoms, metal_idx, metal_sym, csearch_nprocs=1):
         """
         Minimization and E calculation with RDKit after embeding
         """
 
         cenergy, outmols = [], []
 
+        # without templates, all the conformers are minimized at once with RDKit's batch optimizers
+        no_template = coord_Map is None and alg_Map is None and mol_template is None
+        if no_template:
+            batch_energies = minimize_rdkit_confs(
+                mol, self.args.log, ff, self.args.opt_steps_rdkit, csearch_nprocs
+            )
+        else:
+            # the template constraints are the same for all the conformers
+            constraints = get_realign_constraints(mol, coord_Map, mol_template)
+
+        # for the geom filters, the metals are set back once in a copy of the mol without
+        # conformers, and each conformer is checked in a copy of it (instead of copying all
+        # the conformers and setting the metals back for every conformer)
+        if geom != []:
+            mol_geom_template = Chem.Mol(mol)
+            mol_geom_template.RemoveAllConformers()
+            if len(metal_atoms) >= 1:
+                set_metal_atomic_number(mol_geom_template, metal_idx, metal_sym)
+
         for _, conf in enumerate(cids):
-            if coord_Map is None and alg_Map is None and mol_template is None:
-                energy = minimize_rdkit_energy(
-                    mol, conf, self.args.log, ff, self.args.opt_steps_rdkit
-                )
+            if no_template:
+                energy = batch_energies[conf]
             else:  # template realign before doing calculations
                 mol, energy = realign_mol(
                     mol,
@@ -1140,18 +1188,22 @@ class csearch:
                     alg_Map,
                     mol_template,
                     self.args.opt_steps_rdkit,
+                    constraints=constraints
                 )
 
-            # removes geometries that do not pass the filters (geom option)
-            mol_geom = Chem.Mol(mol)
-            # setting the metal back instead of I
-            if len(metal_atoms) >= 1:
-                set_metal_atomic_number(mol_geom, metal_idx, metal_sym)
-
-            passing_geom = geom_filter(self,mol_geom,geom)
+            # removes geometries that do not pass the filters (geom option). The mol
+            # copy is only needed when there are geometric rules to check
+            passing_geom = True
+            if geom != []:
+                mol_geom = Chem.Mol(mol_geom_template)
+                mol_geom.AddConformer(mol.GetConformer(conf), assignId=True)
+                passing_geom = geom_filter(self,mol_geom,geom)
             if passing_geom:
                 cenergy.append(energy)
-                pmol = PropertyMol.PropertyMol(mol)
+                # only the current conformer is copied (instead of all the embedded conformers).
+                # Its ID matches the position in outmols, used later with GetConformer(cid)
+                pmol = PropertyMol.PropertyMol(Chem.Mol(mol, confId=conf))
+                pmol.GetConformer().SetId(len(outmols))
                 outmols.append(pmol)
 
         return outmols, cenergy
@@ -1175,7 +1227,8 @@ class csearch:
         original_atn,
         metal_atoms,
         metal_idx,
-        metal_sym
+        metal_sym,
+        csearch_nprocs=1
     ):
         """
         Minimizes, gets the energy and filters RDKit conformers after embeding
@@ -1185,31 +1238,40 @@ class csearch:
         if geom != []:
             self.args.log.write(f"o  Applying geometry filters ({geom}) ({os.path.basename(Path(name))})")
         outmols, cenergy = self.min_and_E_calc(
-            mol, cids, coord_Map, alg_Map, mol_template, ff, geom, metal_atoms, metal_idx, metal_sym
+            mol, cids, coord_Map, alg_Map, mol_template, ff, geom, metal_atoms, metal_idx, metal_sym, csearch_nprocs
         )
 
-        for i, cid in enumerate(cids):
-            outmols[cid].SetProp("_Name", name + " " + str(i + 1))
-            outmols[cid].SetProp("Energy", str(cenergy[cid]))
-            outmols[cid].SetProp("Real charge", str(charge))
-            outmols[cid].SetProp("Mult", str(mult))
-            outmols[cid].SetProp("SMILES", str(smi))
+        # outmols only contains the conformers that passed the geom filters
+        for cid, outmol in enumerate(outmols):
+            outmol.SetProp("_Name", name + " " + str(cid + 1))
+            outmol.SetProp("Energy", str(cenergy[cid]))
+            outmol.SetProp("Real charge", str(charge))
+            outmol.SetProp("Mult", str(mult))
+            outmol.SetProp("SMILES", str(smi))
 
-        # sorts the energies
-        cids = list(range(len(outmols)))
-        sorted_all_cids = sorted(cids, key=lambda cid: cenergy[cid])
+        # sorts the energies (stable sort, the same order as sorted() for equal energies)
+        sorted_all_cids = np.argsort(cenergy, kind="stable").tolist()
 
         self.args.log.write(f"\no  Applying filters to initial conformers ({os.path.basename(Path(name))})")
         selectedcids_rdkit = conformer_filters(self,sorted_all_cids,cenergy,outmols)
 
         if self.args.program.lower() in ["summ", "rdkit", "crest"]:
-            sdwriter_summ = Chem.SDWriter(f'{csearch_file}')            
             # now exhaustively drive torsions of selected conformers
             total = 0
-            sdwriter = Chem.SDWriter(f'{csearch_file}')
+            # the SUMM conformers are kept in memory until they are filtered in dihedral_filter_and_sdf()
+            rotamers, sdwriter = None, None
+            if self.args.program.lower() == "summ" and not update_to_rdkit:
+                rotamers = []
+            else:
+                sdwriter = Chem.SDWriter(f'{csearch_file}')
+            # the conformers of metal complexes are reoptimized in genConformer_r(), and they all
+            # share the same connectivity, so the MMFF atom typing is done only once
+            mmff_props = None
+            if ff.upper() == "MMFF" and len(metal_atoms) >= 1 and len(selectedcids_rdkit) > 0:
+                mmff_props = Chem.MMFFGetMoleculeProperties(outmols[selectedcids_rdkit[0]])
             for conf in selectedcids_rdkit:
-                if self.args.program.lower() == "summ" and not update_to_rdkit:
-                    sdwriter_summ.write(outmols[conf], conf)
+                if rotamers is not None:
+                    rotamers.append(Chem.Mol(outmols[conf], confId=conf))
                     for m in rotmatches:
                         rdMolTransforms.SetDihedralDeg(
                             outmols[conf].GetConformer(conf), *m, 180.0
@@ -1232,11 +1294,15 @@ class csearch:
                         metal_atoms,
                         metal_idx,
                         metal_sym,
-                        ff
+                        ff,
+                        mmff_props=mmff_props,
+                        rotamers=rotamers
                     )
 
-            sdwriter.close()
-            sdwriter_summ.close()
+            if rotamers is not None:
+                outmols = rotamers
+            else:
+                sdwriter.close()
             status = 1
 
         # keep only structurally different conformers
@@ -1320,11 +1386,11 @@ class csearch:
 
         # energy minimize all to get more realistic results
         # identify the atoms and decide Force Field
-        for atom in mol.GetAtoms():
-            if atom.GetAtomicNum() > 36 and self.args.ff == "MMFF":  # up to Kr for MMFF, if not the code will use UFF
+        if self.args.ff == "MMFF":
+            atomic_nums = np.fromiter((atom.GetAtomicNum() for atom in mol.GetAtoms()), dtype=int, count=mol.GetNumAtoms())
+            if (atomic_nums > 36).any():  # up to Kr for MMFF, if not the code will use UFF
                 self.args.log.write(f"\nx  {self.args.ff} is not compatible with the molecule, changing to UFF (({os.path.basename(Path(name))}))")
                 ff = "UFF"
-                break
 
         try:
             status, mol_crest = self.min_after_embed(
@@ -1345,7 +1411,8 @@ class csearch:
                 original_atn,
                 metal_atoms,
                 metal_idx,
-                metal_sym
+                metal_sym,
+                csearch_nprocs
             )
         except IndexError:
             status = -1
@@ -14,8 +14,25 @@ from aqme.utils import set_metal_atomic_number, get_conf_RMS, load_sdf
 from aqme.csearch.utils import minimize_rdkit_energy
 
 
+def get_realign_constraints(mol, coord_Map, mol_template):
+    """
+    Returns the (idxI, idxJ, distance) constraints of the atoms that match the mol_template.
+    They only depend on the connectivity of the molecule, so they can be calculated once
+    and reused in realign_mol() for all the conformers of the same molecule.
+    """
+
+    num_atom_match = mol.GetSubstructMatch(mol_template)
+    constraints = []
+    for i, idxI in enumerate(num_atom_match):
+        for idxJ in num_atom_match[i + 1 :]:
+            d = coord_Map[idxI].Distance(coord_Map[idxJ])
+            constraints.append((idxI, idxJ, d))
+
+    return constraints
+
+
 def realign_mol(
-    mol, conf, coord_Map, alg_Map, mol_template, maxsteps
+    mol, conf, coord_Map, alg_Map, mol_template, maxsteps, constraints=None
 ):  # RAUL: This function requires a clear separation between minimization and alignment.
     """
     Minimizes and aligns the molecule provided freezing the atoms that match the mol_template
@@ -34,6 +51,8 @@ def realign_mol(
         [description]
     maxsteps : int
         Maximum number of iterations in FF minimization
+    constraints : list, default=None
+        Distance constraints from get_realign_constraints(). If None, they are calculated here
 
     Returns
     -------
@@ -41,12 +60,11 @@ def realign_mol(
         The updated mol object and the final forcefield energy.
     """
 
-    num_atom_match = mol.GetSubstructMatch(mol_template)
+    if constraints is None:
+        constraints = get_realign_constraints(mol, coord_Map, mol_template)
     forcefield = Chem.UFFGetMoleculeForceField(mol, confId=conf)
-    for i, idxI in enumerate(num_atom_match):
-        for idxJ in num_atom_match[i + 1 :]:
-            d = coord_Map[idxI].Distance(coord_Map[idxJ])
-            forcefield.AddDistanceConstraint(idxI, idxJ, d, d, 10000)
+    for idxI, idxJ, d in constraints:
+        forcefield.AddDistanceConstraint(idxI, idxJ, d, d, 10000)
     forcefield.Initialize()
     forcefield.Minimize(maxIts=maxsteps)
     # rotate the embedded conformation onto the core_mol:
@@ -134,6 +152,14 @@ def generating_conformations_fullmonte(
         if abs(globmin - ene) < args.ewin_sample_fullmonte:
             unique_mol_sample.append(unique_mol[c_energy.index(ene)])
 
+    # the template constraints and the MMFF properties are the same for all the conformers
+    if (coord_Map, alg_Map, mol_template) != (None, None, None):
+        constraints = get_realign_constraints(unique_mol[0], coord_Map, mol_template)
+    elif ff.upper() == "MMFF":
+        mmff_props = Chem.MMFFGetMoleculeProperties(unique_mol[0])
+    else:
+        mmff_props = None
+
     while nsteps < args.nsteps_fullmonte + 1:
         seed = nsteps
 
@@ -157,11 +183,12 @@ def generating_conformations_fullmonte(
         # STEP 5: Optimize geometry rot_mol
         if (coord_Map, alg_Map, mol_template) == (None, None, None):
             energy = minimize_rdkit_energy(
-                rot_mol, -1, args.log, ff, args.opt_steps_rdkit
+                rot_mol, -1, args.log, ff, args.opt_steps_rdkit, mmff_props=mmff_props
             )
         else:
             mol, energy = realign_mol(
-                rot_mol, -1, coord_Map, alg_Map, mol_template, args.opt_steps_rdkit
+                rot_mol, -1, coord_Map, alg_Map, mol_template, args.opt_steps_rdkit,
+                constraints=constraints
             )
 
         # STEP 6 : Check for DUPLICATES - energy and rms filter (reuse)
@@ -197,8 +224,7 @@ def generating_conformations_fullmonte(
 
         nsteps += 1
 
-    cids = list(range(len(unique_mol)))
-    sorted_all_cids = sorted(cids, key=lambda cid: c_energy[cid])
+    sorted_all_cids = np.argsort(c_energy, kind="stable").tolist()
 
     # STEP 9: WRITE FINAL uniques to sdf
     sdwriter = Chem.SDWriter(str(csearch_file))
@@ -217,6 +243,7 @@ def generating_conformations_fullmonte(
                 alg_Map,
                 mol_template,
                 args.opt_steps_rdkit,
+                constraints=constraints
             )
             # setting the metal back instead of I
             if len(metal_atoms) >= 1:
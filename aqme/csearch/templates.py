@@ -12,6 +12,46 @@ from aqme.utils import get_conf_RMS, load_sdf
 
 TEMPLATES_PATH = Path(resource_filename("aqme", "templates"))
 
+# F atom of the 5-neighbour template that is removed in the 4-neighbour embeddings
+F_PATTERN = Chem.MolFromSmarts("[F]")
+
+# orders of the metal neighbours (by position in the neighbour list) tried in the
+# squareplanar (3 embeddings) and squarepyramidal (15 embeddings) templates
+SQUAREPLANAR_REPLACEMENTS = [
+    (0, 1, 2, 3),
+    (0, 2, 3, 1),
+    (0, 3, 1, 2),
+]
+
+SQUAREPYRAMIDAL_REPLACEMENTS = [
+    (4, 0, 1, 2, 3),
+    (4, 0, 2, 3, 1),
+    (4, 0, 3, 1, 2),
+    (3, 0, 1, 2, 4),
+    (3, 0, 2, 4, 1),
+    (3, 0, 4, 1, 2),
+    (2, 0, 1, 4, 3),
+    (2, 0, 4, 3, 1),
+    (2, 0, 4, 1, 3),
+    (1, 0, 4, 2, 3),
+    (1, 0, 2, 3, 4),
+    (1, 0, 3, 4, 2),
+    (0, 4, 1, 2, 3),
+    (0, 4, 2, 3, 1),
+    (0, 4, 3, 1, 2),
+]
+
+# atomic number used to fit the metal in the templates, depending on its number of bonds
+BONDS_TO_ATOMIC_NUMBER = {5: 14, 4: 14, 3: 53, 2: 53}
+
+# number of metal neighbours expected by each template
+TEMPLATE_NEIGHBOURS = {
+    "linear": 2,
+    "trigonalplanar": 3,
+    "squareplanar": 4,
+    "squarepyramidal": 5,
+}
+
 
 def template_embed(self, mol, complex_type, metal_idx, maxsteps, heavyonly, maxmatches, name, geom):
     """
@@ -79,7 +119,10 @@ def template_embed_optimize(target, template, metal_idx, maxsteps, log, tempalte
     # add H's to molecule
     molecule = Chem.AddHs(target)
 
-    conf_id = rdDistGeom.EmbedMolecule(molecule, coordMap=coord_map, randomSeed=seed)
+    embed_params = rdDistGeom.ETKDGv3()
+    embed_params.randomSeed = seed
+    embed_params.SetCoordMap(coord_map)
+    conf_id = rdDistGeom.EmbedMolecule(molecule, embed_params)
 
     if conf_id < 0:
         log.write("Could not embed molecule.")
@@ -225,25 +268,21 @@ def calc_neighbours(molecule, metals_idx):
         List of neighbour atoms
     """
 
-    # depending on the amount of neighbours, use Si or I atoms to fit the templates
-    bonds2AtNum = dict()
-    bonds2AtNum[5] = 14
-    bonds2AtNum[4] = 14
-    bonds2AtNum[3] = 53
-    bonds2AtNum[2] = 53
-
-    for atom in molecule.GetAtoms():
-        idx = atom.GetIdx()
-        if idx in metals_idx:
-            neighbours = atom.GetNeighbors()
-            # in case metals are used with different bonds (i.e., Cu2+ and CuL2)
-            n_bonds = len(atom.GetBonds())
-            AtNum = bonds2AtNum[n_bonds]
-            atom.SetAtomicNum(AtNum)
-            if n_bonds == 5:
-                atom.SetFormalCharge(1)
-            return neighbours
-    return []
+    # the first metal in atom order is the one with the lowest Idx, so it can be
+    # fetched directly instead of walking over all the atoms of the molecule
+    found_idx = [idx for idx in metals_idx if idx is not None]
+    if not found_idx:
+        return []
+
+    atom = molecule.GetAtomWithIdx(min(found_idx))
+    neighbours = atom.GetNeighbors()
+    # in case metals are used with different bonds (i.e., Cu2+ and CuL2). Depending on the
+    # amount of neighbours, Si or I atoms are used to fit the templates
+    n_bonds = len(atom.GetBonds())
+    atom.SetAtomicNum(BONDS_TO_ATOMIC_NUMBER[n_bonds])
+    if n_bonds == 5:
+        atom.SetFormalCharge(1)
+    return neighbours
 
 
 def check_metal_neigh(mol, complex_type, metal_idx_ind, log, valid_template):
@@ -265,15 +304,8 @@ def check_metal_neigh(mol, complex_type, metal_idx_ind, log, valid_template):
         Whether the complexes are compatible with the template selected
     """
 
-    if complex_type == "linear":
-        expect_neigh = 2
-    elif complex_type == "trigonalplanar":
-        expect_neigh = 3
-    elif complex_type == "squareplanar":
-        expect_neigh = 4
-    elif complex_type == "squarepyramidal":
-        expect_neigh = 5
-    metal_atom = mol.GetAtoms()[metal_idx_ind]
+    expect_neigh = TEMPLATE_NEIGHBOURS[complex_type]
+    metal_atom = mol.GetAtomWithIdx(metal_idx_ind)
     metal_neigh = metal_atom.GetNeighbors()
     if len(metal_neigh) != expect_neigh:
         log.write(f"x  The number of neighbours of the metal ({len(metal_neigh)}) does not match the number of expected neighbours for the template selected ({complex_type}). No templates will be applied to this system.")
@@ -425,39 +457,25 @@ def four_embed(molecule, template, metal_idx, neighbours, name, maxsteps, log, g
     mol_templates = []
 
     # Remove F atoms from the template
-    for atom in template.GetAtoms():
-        if atom.GetSymbol() == "F":
-            template = Chem.RWMol(template)
-            template.RemoveAtom(atom.GetIdx())
-    template = template.GetMol()
+    template = Chem.DeleteSubstructs(template, F_PATTERN)
 
     # three cases for square planar
-    atn0 = neighbours[0].GetAtomicNum()
-    atn1 = neighbours[1].GetAtomicNum()
-    atn2 = neighbours[2].GetAtomicNum()
-    atn3 = neighbours[3].GetAtomicNum()
+    atn_list = [neighbours[i].GetAtomicNum() for i in range(4)]
 
     # there are atoms that give problems in the embedding for Ir squareplanar complexes (i.e. As).
     # This replaces them for P and them restore them back to normal after the embeding (in genConformer_r() from base.py)
     original_atn = None
     if geom == ['Ir_squareplanar']:
         invalid_atn = [33]
-        atn_list = [atn0,atn1,atn2,atn3]
         for i,atn in enumerate(atn_list):
             if atn in invalid_atn:
                 original_atn = [atn,neighbours[i].GetIdx()]
                 molecule.GetAtomWithIdx(neighbours[i].GetIdx()).SetAtomicNum(15)
                 atn_list[i] = 15
 
-        atn0 = atn_list[0]
-        atn1 = atn_list[1]
-        atn2 = atn_list[2]
-        atn3 = atn_list[3]
-
     replacements_list = [
-        (atn0, atn1, atn2, atn3, 14),
-        (atn0, atn2, atn3, atn1, 14),
-        (atn0, atn3, atn1, atn2, 14),
+        tuple(atn_list[r] for r in replacement) + (14,)
+        for replacement in SQUAREPLANAR_REPLACEMENTS
     ]
     
     cumulative_algMap = []
@@ -502,41 +520,21 @@ def five_embed(molecule, template, metal_idx, neighbours, name, maxsteps, log, g
     alg_maps = []
     mol_templates = []
     counter = 0
-    atomic_numbers = []
-    for _,atom in enumerate(neighbours):
-        atomic_numbers.append(atom.GetAtomicNum())
-    replacements = [
-        [4, 0, 1, 2, 3],
-        [4, 0, 2, 3, 1],
-        [4, 0, 3, 1, 2],
-        [3, 0, 1, 2, 4],
-        [3, 0, 2, 4, 1],
-        [3, 0, 4, 1, 2],
-        [2, 0, 1, 4, 3],
-        [2, 0, 4, 3, 1],
-        [2, 0, 4, 1, 3],
-        [1, 0, 4, 2, 3],
-        [1, 0, 2, 3, 4],
-        [1, 0, 3, 4, 2],
-        [0, 4, 1, 2, 3],
-        [0, 4, 2, 3, 1],
-        [0, 4, 3, 1, 2],
-    ]
+    atomic_numbers = [atom.GetAtomicNum() for atom in neighbours]
 
     original_atn_list = []
-    for replacement in replacements:
-        at0, at1, at2, at3, at4 = [atomic_numbers[r] for r in replacement]
-        template.GetAtomWithIdx(0).SetAtomicNum(at0)
-        template.GetAtomWithIdx(1).SetAtomicNum(at1)
-        template.GetAtomWithIdx(2).SetAtomicNum(at2)
-        template.GetAtomWithIdx(3).SetAtomicNum(at3)
-        template.GetAtomWithIdx(4).SetAtomicNum(at4)
-        template.GetAtomWithIdx(5).SetAtomicNum(14)
-        template.GetAtomWithIdx(5).SetFormalCharge(1)
+    for replacement in SQUAREPYRAMIDAL_REPLACEMENTS:
+        # each embedding keeps its own copy of the template (otherwise all the
+        # mol_templates returned would point to the last replacement)
+        template_mol = Chem.Mol(template)
+        for idx, r in enumerate(replacement):
+            template_mol.GetAtomWithIdx(idx).SetAtomicNum(atomic_numbers[r])
+        template_mol.GetAtomWithIdx(5).SetAtomicNum(14)
+        template_mol.GetAtomWithIdx(5).SetFormalCharge(1)
 
         # assigning and embedding onto the core
         mol_obj, coord_map, alg_map, conf_id, _ = template_embed_optimize(
-            molecule, template, metal_idx, maxsteps, log
+            molecule, template_mol, metal_idx, maxsteps, log
         )
         if conf_id >= 0:
             name_out = f"{name}_{counter}"
@@ -544,7 +542,7 @@ def five_embed(molecule, template, metal_idx, neighbours, name, maxsteps, log, g
             name_return.append(name_out)
             coord_maps.append(coord_map)
             alg_maps.append(alg_map)
-            mol_templates.append(template)
+            mol_templates.append(template_mol)
             original_atn_list.append(None) # only working for Ir squareplanar
             counter += 1
     return mol_objects, name_return, coord_maps, alg_maps, mol_templates, original_atn_list
@@ -411,14 +411,18 @@ def com_2_xyz(input_file):
     return path_xyz, charge, mult
 
 
-def minimize_rdkit_energy(mol, conf, log, FF, maxsteps):
+def minimize_rdkit_energy(mol, conf, log, FF, maxsteps, mmff_props=None):
     """
-    Minimizes a conformer of a molecule and returns the final energy.
+    Minimizes a conformer of a molecule and returns the final energy. The MMFF properties
+    (mmff_props) can be reused for conformers of molecules with the same connectivity,
+    otherwise they are calculated here.
     """
 
     forcefield = None
     if FF.upper() == "MMFF":
-        properties = Chem.MMFFGetMoleculeProperties(mol)
+        properties = mmff_props
+        if properties is None:
+            properties = Chem.MMFFGetMoleculeProperties(mol)
         forcefield = Chem.MMFFGetMoleculeForceField(mol, properties, confId=conf)
         if forcefield is None:
             log.write(f"x  Force field {FF} did not work! Changing to UFF.")
@@ -437,23 +441,60 @@ def minimize_rdkit_energy(mol, conf, log, FF, maxsteps):
     return energy
 
 
+def minimize_rdkit_confs(mol, log, FF, maxsteps, nprocs):
+    """
+    Minimizes all the conformers of a molecule in one batch (the loop over conformers
+    runs in RDKit's C++ layer using nprocs threads) and returns a dictionary with the
+    final energy of each conformer ID.
+    """
+
+    results = None
+    try:
+        if FF.upper() == "MMFF":
+            if Chem.MMFFHasAllMoleculeParams(mol):
+                results = Chem.MMFFOptimizeMoleculeConfs(mol, numThreads=nprocs, maxIters=maxsteps)
+            else:
+                log.write(f"x  Force field {FF} did not work! Changing to UFF.")
+
+        if results is None:
+            # if results is None means that MMFF will not work. Attempt UFF.
+            results = Chem.UFFOptimizeMoleculeConfs(mol, numThreads=nprocs, maxIters=maxsteps)
+    except RuntimeError:
+        # fall back to minimizing the conformers one by one (sharing the MMFF atom typing)
+        mmff_props = Chem.MMFFGetMoleculeProperties(mol) if FF.upper() == "MMFF" else None
+        return {
+            conf.GetId(): minimize_rdkit_energy(mol, conf.GetId(), log, FF, maxsteps, mmff_props=mmff_props)
+            for conf in mol.GetConformers()
+        }
+
+    energies = {}
+    for conf, (_, energy) in zip(mol.GetConformers(), results):
+        energies[conf.GetId()] = float(energy)
+
+    return energies
+
+
+# this is rdkit's "strict" pattern for rotatable dihedrals, compiled only once
+DIHEDRAL_SMARTS = Chem.MolFromSmarts(
+    r"*~[!$(*#*)&!D1&!$(C(F)(F)F)&!$(C(Cl)(Cl)Cl)&!$(C(Br)(Br)Br)&!$(C([CH3])([CH3])[CH3])&!$([CD3](=[N,O,S])-!@[#7,O,S!D1])&!$([#7,O,S!D1]-!@[CD3]=[N,O,S])&!$([CD3](=[N+])-!@[#7!D1])&!$([#7!D1]-!@[CD3]=[N+])]-!@[!$(*#*)&!D1&!$(C(F)(F)F)&!$(C(Cl)(Cl)Cl)&!$(C(Br)(Br)Br)&!$(C([CH3])([CH3])[CH3])]~*"
+)
+
+
 def getDihedralMatches(mol, heavy):
-    # this is rdkit's "strict" pattern
-    pattern = r"*~[!$(*#*)&!D1&!$(C(F)(F)F)&!$(C(Cl)(Cl)Cl)&!$(C(Br)(Br)Br)&!$(C([CH3])([CH3])[CH3])&!$([CD3](=[N,O,S])-!@[#7,O,S!D1])&!$([#7,O,S!D1]-!@[CD3]=[N,O,S])&!$([CD3](=[N+])-!@[#7!D1])&!$([#7!D1]-!@[CD3]=[N+])]-!@[!$(*#*)&!D1&!$(C(F)(F)F)&!$(C(Cl)(Cl)Cl)&!$(C(Br)(Br)Br)&!$(C([CH3])([CH3])[CH3])]~*"
-    qmol = Chem.MolFromSmarts(pattern)
-    matches = mol.GetSubstructMatches(qmol)
+    matches = mol.GetSubstructMatches(DIHEDRAL_SMARTS)
 
-    # these are all sets of 4 atoms, uniquify by middle two
+    # these are all sets of 4 atoms, uniquify by middle two (stored as sorted pairs)
     uniqmatches = []
     seen = set()
     for (a, b, c, d) in matches:
-        if (b, c) not in seen and (c, b) not in seen:
+        bond_key = (b, c) if b < c else (c, b)
+        if bond_key not in seen:
             if heavy:
                 if (
                     mol.GetAtomWithIdx(a).GetSymbol() != "H"
                     and mol.GetAtomWithIdx(d).GetSymbol() != "H"
                 ):
-                    seen.add((b, c))
+                    seen.add(bond_key)
                     uniqmatches.append((a, b, c, d))
             if not heavy:
                 if (
@@ -462,7 +503,7 @@ def getDihedralMatches(mol, heavy):
                 ):
                     pass
                 else:
-                    seen.add((b, c))
+                    seen.add(bond_key)
                     uniqmatches.append((a, b, c, d))
     return uniqmatches
 
@@ -512,18 +553,18 @@ def smi_to_mol(
         params = Chem.SmilesParserParams()
         params.removeHs = False
         smi = smi[0]
-        try:
-            # fix mapped atoms
-            if ':' in smi:
-                # smi = fix_mapped_atoms(smi)
-                log.write(f"\nx  WARNING! The SMILES string provided ( {smi} ) contains mapped atoms, make sure you include their corresponding H atoms explicitly in the SMILES (otherwise they'll be omitted). For example, use [C:1]([H])([H])([H])C instead of [C:1]C.\n")
-
-            mol = Chem.MolFromSmiles(smi, params)
-            Chem.SanitizeMol(mol)
+        # fix mapped atoms
+        if ':' in smi:
+            # smi = fix_mapped_atoms(smi)
+            log.write(f"\nx  WARNING! The SMILES string provided ( {smi} ) contains mapped atoms, make sure you include their corresponding H atoms explicitly in the SMILES (otherwise they'll be omitted). For example, use [C:1]([H])([H])([H])C instead of [C:1]C.\n")
+
+        # the SMILES parser already sanitizes the mol (including the stereo assignment and
+        # cleanup), and it returns None when sanitization fails (i.e. with valence errors)
+        mol = Chem.MolFromSmiles(smi, params)
+        if mol is not None:
             mol = Chem.AddHs(mol)
-        except Chem.AtomValenceException:
+        else:
             log.write(f"\nx  The SMILES string provided ( {smi} ) contains errors or the molecule needs to be drawn in a different way. For example, N atoms from ligands of metal complexes should be N+ since they're drawn with four bonds in ChemDraw, same for O atoms in carbonyl ligands, etc.\n")
-            mol = None
 
     return (
         mol,
@@ -555,6 +596,10 @@ def smi_to_mol(
     
 #     return smi
 
+# formal charge of the I atom that replaces a metal, depending on its number of neighbours
+NEIGHBORS_2_FORMAL_CHARGE = dict(zip(range(2, 9), range(-3, 4)))
+
+
 def substituted_mol(mol, checkI, metal_atoms):
     """
     Returns a molecule object in which all metal atoms are replaced by Iodine
@@ -562,32 +607,26 @@ def substituted_mol(mol, checkI, metal_atoms):
 
     """
 
-    metal_idx = []
-    complex_coord = []
-    metal_sym = []
-
-    for _ in metal_atoms:
-        metal_idx.append(None)
-        complex_coord.append(None)
-        metal_sym.append(None)
+    metal_idx = [None] * len(metal_atoms)
+    complex_coord = [None] * len(metal_atoms)
+    metal_sym = [None] * len(metal_atoms)
 
-    Neighbors2FormalCharge = dict()
-    for i, j in zip(range(2, 9), range(-3, 4)):
-        Neighbors2FormalCharge[i] = j
+    # position of each metal symbol in metal_atoms (first occurrence, as in list.index())
+    metal_pos = dict()
+    for i, symbol in enumerate(metal_atoms):
+        metal_pos.setdefault(symbol, i)
 
     for atom in mol.GetAtoms():
         symbol = atom.GetSymbol()
-        if symbol in metal_atoms:
-            metal_sym[metal_atoms.index(symbol)] = symbol
-            metal_idx[metal_atoms.index(symbol)] = atom.GetIdx()
-            complex_coord[metal_atoms.index(symbol)] = len(
-                atom.GetNeighbors()
-            )
+        if symbol in metal_pos:
+            pos = metal_pos[symbol]
+            n_neighbors = atom.GetDegree()
+            metal_sym[pos] = symbol
+            metal_idx[pos] = atom.GetIdx()
+            complex_coord[pos] = n_neighbors
             if checkI == "I":
                 atom.SetAtomicNum(53)
-                n_neighbors = len(atom.GetNeighbors())
                 if n_neighbors > 1:
-                    formal_charge = Neighbors2FormalCharge[n_neighbors]
-                    atom.SetFormalCharge(formal_charge)
+                    atom.SetFormalCharge(NEIGHBORS_2_FORMAL_CHARGE[n_neighbors])
 
     return metal_idx, complex_coord, metal_sym
@@ -5,12 +5,13 @@
 
 import os
 import shutil
+import numpy as np
 from pathlib import Path
 from rdkit import Chem
 from rdkit.Chem import rdMolTransforms, Descriptors
 from rdkit.ML.Cluster import Butina
 
-from aqme.utils import periodic_table, get_conf_RMS
+from aqme.utils import PERIODIC_TABLE_SET, get_conf_RMS, get_rms_maps
 
 
 # Main API of the geometry filter
@@ -52,6 +53,10 @@ def geom_filter(self,mol,geom):
     return passing
 
 
+# SMARTS patterns of the Ir-ligand bonds used in Ir_SP_filter(), compiled only once
+IR_SP_SMARTS = [Chem.MolFromSmarts(smarts) for smarts in ['[Ir][C-]','[Ir][N+]','[Ir][n+]','[Ir][N]','[Ir][n]','[Ir][P+]','[Ir][p+]','[Ir][As+]']]
+
+
 def Ir_SP_filter(mol):
     '''
     Special geometry rule designed to filter the correct conformers of Ir squareplanar complexes.
@@ -59,42 +64,37 @@ def Ir_SP_filter(mol):
     '''
 
     # get Ir and its potential neighbours
-    smarts_list = ['[Ir][C-]','[Ir][N+]','[Ir][n+]','[Ir][N]','[Ir][n]','[Ir][P+]','[Ir][p+]','[Ir][As+]']
     Ir_neighs = []
+    seen_pairs = set()
     L_atom_1, L_atom_2, Ir_idx = None, None, None
-    for smarts in smarts_list:
-        pairs = list(mol.GetSubstructMatches(Chem.MolFromSmarts(smarts)))
-        if len(pairs) > 0:
-            for pair in pairs:
-                if pair not in Ir_neighs:
-                    Ir_neighs.append(pair)
+    for pattern in IR_SP_SMARTS:
+        for pair in mol.GetSubstructMatches(pattern):
+            if pair not in seen_pairs:
+                seen_pairs.add(pair)
+                Ir_neighs.append(pair)
 
     for Ir_neigh in Ir_neighs:
         for idx in Ir_neigh:
             correct_neigh = False
+            atom = mol.GetAtomWithIdx(idx)
+            atomic_num = atom.GetAtomicNum()
             # find Ir
-            if mol.GetAtoms()[idx].GetAtomicNum() == 77 and Ir_idx is None:
+            if atomic_num == 77 and Ir_idx is None:
                 Ir_idx = idx
             # find right C for lugand of type A and discard all the others from types B and C (from the Chemical Science paper)
-            elif mol.GetAtoms()[idx].GetAtomicNum() == 6:
-                N_neigh = 0
-                for C_neigh in mol.GetAtoms()[idx].GetNeighbors():
-                    if C_neigh.GetAtomicNum() == 7:
-                        N_neigh += 1
+            elif atomic_num == 6:
+                N_neigh = sum(1 for neigh in atom.GetNeighbors() if neigh.GetAtomicNum() == 7)
                 if N_neigh == 2:
                     correct_neigh = True
             
             # find right N for lugand of type A and discard all the others from types B and C (from the Chemical Science paper)
-            elif mol.GetAtoms()[idx].GetAtomicNum() == 7:
-                C_neigh = 0
-                for N_neigh in mol.GetAtoms()[idx].GetNeighbors():
-                    if N_neigh.GetAtomicNum() == 6:
-                        C_neigh += 1
+            elif atomic_num == 7:
+                C_neigh = sum(1 for neigh in atom.GetNeighbors() if neigh.GetAtomicNum() == 6)
                 if C_neigh in [2,3]:
                     correct_neigh = True
 
             # find P and As atoms from ligands of type A
-            elif mol.GetAtoms()[idx].GetAtomicNum() in [15,33]:
+            elif atomic_num in [15,33]:
                 correct_neigh = True
 
             if correct_neigh == True:
@@ -137,7 +137,7 @@ def matching_fun(self,mol,type_match,geom,passing):
         smarts_content = 'Ir_squareplanar'
 
     mol_conf = mol.GetConformer(0) # Retrieve the only 3D conformer generated in that mol object for rdMolTransforms
-    if smarts_content in periodic_table():
+    if smarts_content in PERIODIC_TABLE_SET:
         if len(matches) >= 1:
             passing = True
     elif len(matches) == 2:
@@ -167,9 +167,9 @@ def filters(mol, log, molwt_cutoff):
         return False
 
     # Filter 2
-    symbols = [atom.GetSymbol() for atom in mol.GetAtoms()]
+    symbols = {atom.GetSymbol() for atom in mol.GetAtoms()}
 
-    unknown_atoms = list(set(symbols) - set(periodic_table()))
+    unknown_atoms = list(symbols - PERIODIC_TABLE_SET)
     if unknown_atoms:
         log.write(f"x  Exiting as atoms [{','.join(unknown_atoms)}] are not in the periodic table")
         return False
@@ -256,7 +256,7 @@ def pre_E_filter(
     Parameters
     ----------
     sortedcids : list or pd.Dataframe?
-            List of compound Ids.
+            List of compound Ids, sorted by energy.
     cenergy : list or pd.Dataframe?
             list of compound energies
     threshold : float
@@ -275,29 +275,113 @@ def pre_E_filter(
 
     # Add the first one
     selectedcids_initial.append(sortedcids[0])
+    seen_cids = {sortedcids[0]}
+    # since the compounds are sorted by energy, the closest admitted compound in energy is
+    # always the last one admitted, so only that energy difference needs to be checked
+    last_energy = cenergy[sortedcids[0]]
     for conf in sortedcids[1:]:
-        is_unique = True
-        # check rmsd
-        for seenconf in selectedcids_initial:
-            E_diff = abs(cenergy[conf] - cenergy[seenconf])  # in kcal/mol
-            if E_diff < threshold:
-                eng_dup += 1
-                is_unique = False
-                break
-        if is_unique:
-            if conf not in selectedcids_initial:
-                selectedcids_initial.append(conf)
+        E_diff = abs(cenergy[conf] - last_energy)  # in kcal/mol
+        if E_diff < threshold:
+            eng_dup += 1
+        elif conf not in seen_cids:
+            selectedcids_initial.append(conf)
+            seen_cids.add(conf)
+            last_energy = cenergy[conf]
 
     return selectedcids_initial
 
 
+def mol_topology(mol):
+    """
+    Atoms and bonds of a mol, used to check if two mols can share the same atom mappings in get_conf_RMS
+    """
+
+    atoms = tuple((atom.GetAtomicNum(), atom.GetFormalCharge()) for atom in mol.GetAtoms())
+    bonds = tuple((bond.GetBeginAtomIdx(), bond.GetEndAtomIdx(), bond.GetBondType()) for bond in mol.GetBonds())
+
+    return atoms, bonds
+
+
+def get_rms_coords(outmols, cids, heavy, calc_type):
+    """
+    Stores the coordinates used in get_conf_RMS (same atoms) of all the conformers in one
+    contiguous (n_confs, n_atoms, 3) array, centered on their centroids, so the RMSD filter
+    works on NumPy arrays instead of querying the RDKit conformers for every pair. The heavy
+    atoms are taken from the first conformer, so all the cids must have its atoms and bonds
+    (see same_topology in RMSD_and_E_filter); otherwise, the rows would compare different atoms.
+
+    Returns
+    -------
+    rms_rows : dict
+        Row of each cid in rms_coords (conformers that couldn't be read are not included)
+    rms_coords : numpy.ndarray
+        Centered coordinates of the conformers
+    rms_svals : numpy.ndarray
+        Singular values of the centered coordinates of each conformer, shape (n_confs, 3)
+    """
+
+    # atoms kept by RemoveHs() in get_conf_RMS
+    ref_mol = outmols[cids[0]]
+    atom_idx = None
+    if heavy:
+        mol_idx = Chem.Mol(ref_mol)
+        for atom in mol_idx.GetAtoms():
+            atom.SetIntProp("rms_idx", atom.GetIdx())
+        atom_idx = [atom.GetIntProp("rms_idx") for atom in Chem.RemoveHs(mol_idx).GetAtoms()]
+
+    rms_rows, coords_list = {}, []
+    for cid in cids:
+        if outmols[cid].GetNumAtoms() != ref_mol.GetNumAtoms():
+            continue
+        conf_id = cid if calc_type == "rdkit" else -1
+        try:
+            coords = outmols[cid].GetConformer(conf_id).GetPositions()
+        except ValueError:
+            continue
+        if atom_idx is not None:
+            coords = coords[atom_idx]
+        if len(coords) == 0:
+            continue
+        rms_rows[cid] = len(coords_list)
+        coords_list.append(coords)
+
+    if len(coords_list) == 0:
+        return {}, np.empty((0, 0, 3)), np.empty((0, 3))
+
+    rms_coords = np.stack(coords_list)
+    rms_coords -= rms_coords.mean(axis=1, keepdims=True)
+    rms_svals = np.linalg.svd(rms_coords, compute_uv=False)
+
+    return rms_rows, rms_coords, rms_svals
+
+
+def batch_rmsd(kept_coords, cand_coords):
+    """
+    Returns the RMSD (after the optimal rotation, Kabsch algorithm) between one conformer
+    and a batch of conformers, keeping the atom numbering (no symmetry matches). All the
+    coordinates must be centered. The K 3x3 correlation matrices are built with one einsum
+    and diagonalized with a single batched SVD.
+    """
+
+    corr_matrices = np.einsum('kai,aj->kij', kept_coords, cand_coords)
+    u, s, vt = np.linalg.svd(corr_matrices)
+    # avoid improper rotations (reflections)
+    sign = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    s[:, -1] *= sign
+    sq_sum = (kept_coords ** 2).sum(axis=(1, 2)) + (cand_coords ** 2).sum()
+    msd = (sq_sum - 2 * s.sum(axis=1)) / cand_coords.shape[0]
+
+    return np.sqrt(np.clip(msd, 0, None))
+
+
 def RMSD_and_E_filter(
     outmols, selectedcids_initial, cenergy, args, calc_type
 ):
     """
     This filter selects the first compound that it finds with energy an energy
     difference lower than the threshold with a higher than the threshold rms
-    with respect to the nearest (in energy) accepted compound.
+    with respect to the nearest (in energy) accepted compound. The compounds in
+    selectedcids_initial must be sorted by energy.
     """
 
     selectedcids = []
@@ -307,19 +391,65 @@ def RMSD_and_E_filter(
     rms_threshold = float(args.rms_threshold)
     max_matches_rmsd = int(args.max_matches_rmsd)
 
+    # the symmetry mappings of GetBestRMS are generated only once (when they're first needed) and
+    # reused for the conformers with the same atoms and bonds as the first one
+    ref_topology = mol_topology(outmols[selectedcids_initial[0]])
+    same_topology = {
+        cid: mol_topology(outmols[cid]) == ref_topology for cid in selectedcids_initial
+    }
+    rms_maps = None
+
+    # rotations and atom permutations do not change the singular values of the centered
+    # coordinates (the square roots of the principal moments), and ||svals_1 - svals_2||/sqrt(N)
+    # is a lower bound of the RMSD of a pair (Mirsky's inequality). This is used to skip the
+    # GetBestRMS symmetry matching in pairs that can't be duplicates. Only the conformers with
+    # the same atoms and bonds as the first one are included, since for them the original atom
+    # numbering is one of the mappings of GetBestRMS and the heavy atoms are the same
+    rms_rows, rms_coords, rms_svals = get_rms_coords(
+        outmols, [cid for cid in selectedcids_initial if same_topology[cid]], args.heavyonly, calc_type
+    )
+    sqrt_n_atoms = np.sqrt(rms_coords.shape[1])
+
     for _,conf in enumerate(selectedcids_initial[1:]):
         # This keeps track of whether or not your conformer is unique
         excluded_conf = False
 
-        # check energy and rmsd
-        for seenconf in selectedcids:
-            E_diff = abs(cenergy[conf] - cenergy[seenconf])  # in kcal/mol
-            if E_diff < energy_threshold:
+        # conformers with energies within the energy threshold. The accepted conformers are
+        # sorted by energy, so the search stops at the first one outside the threshold
+        seen_window = []
+        for seenconf in reversed(selectedcids):
+            if abs(cenergy[conf] - cenergy[seenconf]) >= energy_threshold:  # in kcal/mol
+                break
+            seen_window.append(seenconf)
+
+        # for conformers with the same topology, the RMSD with the original atom numbering is
+        # never lower than the best RMSD from GetBestRMS, so duplicates are detected for all
+        # the conformers at once when possible (the rest of pairs go to get_conf_RMS)
+        if conf in rms_rows:
+            seen_rows = [rms_rows[seenconf] for seenconf in seen_window if seenconf in rms_rows]
+            if len(seen_rows) > 0:
+                rms_batch = batch_rmsd(rms_coords[seen_rows], rms_coords[rms_rows[conf]])
+                if (rms_batch < rms_threshold).any():
+                    excluded_conf = True
+                    eng_rms_dup += 1
+
+        # check rmsd considering symmetry
+        if not excluded_conf:
+            for seenconf in seen_window:
+                if conf in rms_rows and seenconf in rms_rows:
+                    rms_lower_bound = np.linalg.norm(rms_svals[rms_rows[conf]] - rms_svals[rms_rows[seenconf]]) / sqrt_n_atoms
+                    if rms_lower_bound > rms_threshold:
+                        continue
                 n_mol_1 = -1
                 n_mol_2 = -1
                 if calc_type == "rdkit":
                     n_mol_1 = seenconf
                     n_mol_2 = conf
+                pair_maps = None
+                if same_topology[seenconf] and same_topology[conf]:
+                    if rms_maps is None:
+                        rms_maps = get_rms_maps(outmols[selectedcids_initial[0]], args.heavyonly, max_matches_rmsd)
+                    pair_maps = rms_maps
                 try:
                     rms = get_conf_RMS(
                         outmols[seenconf],
@@ -327,7 +457,8 @@ def RMSD_and_E_filter(
                         n_mol_1,
                         n_mol_2,
                         args.heavyonly,
-                        max_matches_rmsd
+                        max_matches_rmsd,
+                        rms_maps=pair_maps
                     )
                 except RuntimeError:
                     rms = rms_threshold + 1
@@ -72,7 +72,6 @@ import glob
 import time
 import pandas as pd
 import json
-import subprocess
 import numpy as np
 from pathlib import Path
 from aqme.utils import (
@@ -81,6 +80,7 @@ from aqme.utils import (
     get_info_input,
     load_variables,
     read_file,
+    read_file_tail,
     cclib_atoms_coords,
     check_files,
     check_dependencies
@@ -90,10 +90,13 @@ from aqme.qcorr_utils import (
     check_isomerization,
     full_check,
     get_json_data,
-    get_cclib_params
+    get_cclib_params,
+    write_cclib_json
 )
 from aqme.qprep import qprep
 
+GEN_KEYWORDS = frozenset(("gen", "genecp"))
+
 
 class qcorr:
     """
@@ -174,7 +177,7 @@ class qcorr:
         for file in sorted(self.args.files):
             # get initial cclib data and termination/error types and discard calcs with no data
             file_name = os.path.basename(Path(file)).split(".")[0]
-            termination, errortype, cclib_data, outlines, file = self.cclib_init(
+            termination, errortype, cclib_data, file = self.cclib_init(
                 file, file_name
             )
             if errortype in ["no_data", "atomicbasiserror"]:
@@ -203,7 +206,7 @@ class qcorr:
 
             elif termination != "normal":
                 atom_types, cartesians, cclib_data = self.analyze_abnormal(
-                    errortype, cclib_data, outlines
+                    errortype, cclib_data, file
                 )
 
             # check for isomerization
@@ -325,12 +328,11 @@ class qcorr:
         with cclib and load the data in the cclib json files
         """
 
-        # cclib generation of json files with ccwrite
+        # cclib generation of json files (same output as ccwrite)
         termination, errortype, cclib_data, file = self.json_gen(file, file_name)
-        outlines = []
 
         if errortype == "no_data":
-            return termination, errortype, None, None, file 
+            return termination, errortype, None, file
 
         # calculations with 1 atom
         if cclib_data["properties"]["number of atoms"] == 1:
@@ -354,8 +356,9 @@ class qcorr:
                     errortype = "no_freq"
 
             # use very short reversed loop to find basis set incompatibilities and SCF errors
-            outlines = read_file(os.getcwd(), self.args.w_dir_main, file)
-            for i in reversed(range(len(outlines) - 15, len(outlines))):
+            # (only the last lines of the file are read)
+            outlines = read_file_tail(os.getcwd(), self.args.w_dir_main, file, 16)
+            for i in reversed(range(1, len(outlines))):
                 if (
                     outlines[i].find("Normal termination") > -1
                     and errortype != "no_freq"
@@ -402,7 +405,7 @@ class qcorr:
                     ):
                         errortype = "spin_contaminated"
 
-        return termination, errortype, cclib_data, outlines, file 
+        return termination, errortype, cclib_data, file
 
     def analyze_normal(self, duplicate_data, errortype, cclib_data, file_name):
         """
@@ -532,7 +535,7 @@ class qcorr:
 
         return atom_types, cartesians, duplicate_data, errortype, cclib_data, dup_off
 
-    def analyze_abnormal(self, errortype, cclib_data, outlines):
+    def analyze_abnormal(self, errortype, cclib_data, file):
         """
         Analyze errors from calculations that did not finish normally
         """
@@ -590,6 +593,8 @@ class qcorr:
                     # for optimizations that fail before the first step
                     min_RMS = 0
 
+                # the full output file is only read when the coordinates are needed
+                outlines = read_file(os.getcwd(), self.args.w_dir_main, file)
                 atom_types, cartesians = QM_coords(
                     outlines,
                     min_RMS,
@@ -606,15 +611,11 @@ class qcorr:
         """
 
         isomerized = False
-        isom_valid = True
         init_csv = pd.DataFrame()
-        try:
-            os.chdir(self.args.isom_inputs)
-        except FileNotFoundError:
+        # the input files are read from isom_inputs with full paths (without moving into the folder)
+        isom_folder = Path(self.args.isom_inputs)
+        if not os.path.isdir(isom_folder):
             self.args.log.write("x  The PATH specified in isom_inputs doesn't exist!")
-            isom_valid = False
-
-        if not isom_valid:
             os.chdir(self.args.initial_dir)
             self.args.log.finalize()
             sys.exit()
@@ -623,11 +624,11 @@ class qcorr:
             atoms_com, coords_com, atoms_and_coords = [], [], []
             if len(self.args.isom_type.split(".")) == 1:
                 atoms_and_coords, _, _ = get_info_input(
-                    f'{os.path.basename(Path(file)).split(".")[0]}.{self.args.isom_type}'
+                    isom_folder / f'{os.path.basename(Path(file)).split(".")[0]}.{self.args.isom_type}'
                 )
 
             elif self.args.isom_type.split(".")[1] != "csv":
-                init_csv = pd.read_csv(self.args.isom_type)
+                init_csv = pd.read_csv(isom_folder / self.args.isom_type)
 
             for line in atoms_and_coords:
                 atoms_com.append(line.split()[0])
@@ -657,8 +658,6 @@ class qcorr:
         if isomerized:
             errortype = "isomerization"
 
-        os.chdir(self.args.w_dir_main)
-
         return errortype
 
     def qcorr_fixing(self, cclib_data, file, atom_types, cartesians):
@@ -698,7 +697,7 @@ class qcorr:
             if program == 'gaussian':
                 for keyword in cclib_data["metadata"]["keywords line"].split():
                     for subkey in keyword.split('/'):
-                        if subkey in ['gen','genecp']:
+                        if subkey in GEN_KEYWORDS:
                             if '' in [self.args.bs_gen,self.args.bs_nogen]:
                                 self.args.log.write("x  WARNING! You are using gen(ECP) but you are not specifying two basis sets. Please, add them with the bs_gen and bs_nogen options.")
                                 self.args.log.finalize()
@@ -736,8 +735,7 @@ class qcorr:
 
         termination, errortype = "normal", "none"
 
-        command_run_1 = ["ccwrite", "json", file]
-        subprocess.run(command_run_1, capture_output=True)
+        cclib_error = write_cclib_json(self, file)
 
         cclib_data = {}
         try:
@@ -747,8 +745,9 @@ class qcorr:
             try:
                 # this part avoids problems when using cclib from command lines (not complete file PATH)
                 file = f'{self.args.initial_dir}/{file}'
-                command_run_2 = ["ccwrite", "json", file]
-                subprocess.run(command_run_2, capture_output=True)
+                # the error from the first attempt is kept, since this PATH is only a fallback
+                retry_error = write_cclib_json(self, file)
+                cclib_error = cclib_error or retry_error
                 with open(file_name + ".json") as json_file:
                     cclib_data = json.load(json_file)
             except FileNotFoundError:
@@ -766,6 +765,8 @@ class qcorr:
                     termination, errortype = "normal", "none"
 
         if errortype == "no_data":
+            if cclib_error is not None:
+                self.args.log.write(f"x  cclib couldn't process {os.path.basename(file)} ({cclib_error})")
             self.args.log.write(f"x  Potential cclib compatibility problem or no data found for file {file_name} (Termination = {termination}, Error type = {errortype})")
 
         return termination, errortype, cclib_data, file
@@ -787,33 +788,24 @@ class qcorr:
             New set of cartesian coordinates generated after displacing the original coordinates along the normal modes of the corresponding imaginary frequencies
         """
 
-        shift = []
-
         # could get rid of atomic units here, if zpe_rat definition is changed
-        for mode, _ in enumerate(cclib_data["vibrations"]["frequencies"]):
-            # moves along all imaginary freqs (ignoring the TS imag freq, assumed to be the most negative freq)
-            if (
-                mode == 0
-                and cclib_data["metadata"]["ground or transition state"]
-                == "transition_state"
-            ):
-                shift.append(0.0)
-            else:
-                if cclib_data["vibrations"]["frequencies"][mode] < 0.0:
-                    shift.append(float(self.args.amplitude_ifreq))
-                else:
-                    shift.append(0.0)
-
-            # The starting geometry is displaced along each normal mode according to the random shift
-            for atom in range(0, cclib_data["properties"]["number of atoms"]):
-                for coord in range(0, 3):
-                    cartesians[atom][coord] = (
-                        cartesians[atom][coord]
-                        + cclib_data["vibrations"]["displacement"][mode][atom][coord]
-                        * shift[mode]
-                    )
+        # moves along all imaginary freqs (ignoring the TS imag freq, assumed to be the most negative freq)
+        freqs = np.asarray(cclib_data["vibrations"]["frequencies"], dtype=float)
+        shift = np.where(freqs < 0.0, float(self.args.amplitude_ifreq), 0.0)
+        if len(shift) > 0 and cclib_data["metadata"]["ground or transition state"] == "transition_state":
+            shift[0] = 0.0
+
+        # The starting geometry is displaced along each normal mode according to the random shift
+        # (whole arrays of atoms x coords are added, one imaginary mode at a time)
+        n_atoms = cclib_data["properties"]["number of atoms"]
+        displacement = cclib_data["vibrations"]["displacement"]
+        new_cartesians = np.array(cartesians, dtype=float)
+        for mode in np.flatnonzero(shift):
+            new_cartesians[:n_atoms, :3] += (
+                np.asarray(displacement[mode], dtype=float)[:n_atoms, :3] * shift[mode]
+            )
 
-        return cartesians
+        return new_cartesians.tolist()
 
     def organize_outputs(self, file, termination, errortype, file_terms):
         """
@@ -913,27 +905,29 @@ class qcorr:
         Write information about the QCORR analysis in a csv
         """
 
-        ana_data = pd.DataFrame()
-        ana_data.at[0, "Total files"] = len(self.args.files)
-        ana_data.at[0, "Normal termination"] = file_terms["finished"]
-        ana_data.at[0, "Single-point calcs"] = file_terms["sp_calcs"]
-        ana_data.at[0, "Extra imag. freq."] = file_terms["extra_imag_freq"]
-        ana_data.at[0, "TS with no imag. freq."] = file_terms["ts_no_imag_freq"]
-        ana_data.at[0, "Freq not converged"] = file_terms["freq_no_conv"]
-        ana_data.at[0, "Linear mol with wrong n of freqs"] = file_terms[
-            "linear_mol_wrong"
-        ]
-        ana_data.at[0, "SCF error"] = file_terms["scf_error"]
-        ana_data.at[0, "No data"] = file_terms["no_data"]
-        ana_data.at[0, "Basis set error"] = file_terms["atom_error"]
-        ana_data.at[0, "Other errors"] = file_terms["not_specified"]
+        # the columns are collected first and the DataFrame is built once (instead of
+        # growing an empty DataFrame with one .at assignment per column)
+        stats = {
+            "Total files": len(self.args.files),
+            "Normal termination": file_terms["finished"],
+            "Single-point calcs": file_terms["sp_calcs"],
+            "Extra imag. freq.": file_terms["extra_imag_freq"],
+            "TS with no imag. freq.": file_terms["ts_no_imag_freq"],
+            "Freq not converged": file_terms["freq_no_conv"],
+            "Linear mol with wrong n of freqs": file_terms["linear_mol_wrong"],
+            "SCF error": file_terms["scf_error"],
+            "No data": file_terms["no_data"],
+            "Basis set error": file_terms["atom_error"],
+            "Other errors": file_terms["not_specified"],
+        }
         if float(self.args.s2_threshold) > 0.0:
-            ana_data.at[0, "Spin contamination"] = file_terms["spin_contaminated"]
-        ana_data.at[0, "Duplicates"] = file_terms["duplicate_calc"]
+            stats["Spin contamination"] = file_terms["spin_contaminated"]
+        stats["Duplicates"] = file_terms["duplicate_calc"]
         if len(self.args.geom) >= 1:
-            ana_data.at[0, "geom filter"] = file_terms["geom_qcorr"]
+            stats["geom filter"] = file_terms["geom_qcorr"]
         if self.args.isom_type is not None:
-            ana_data.at[0, "Isomerization"] = file_terms["isomerized"]
+            stats["Isomerization"] = file_terms["isomerized"]
+        ana_data = pd.DataFrame([stats])
         path_as_str = self.args.initial_dir.as_posix()
         csv_qcorr = path_as_str + f"/QCORR-run_{self.args.round_num}-stats.csv"
         if self.args.verbose:
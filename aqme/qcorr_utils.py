@@ -4,9 +4,12 @@
 ######################################################.
 
 import os
+import re
 import glob
 import pandas as pd
 import json
+import logging
+import warnings
 import cclib
 from pathlib import Path
 from aqme.utils import move_file, read_file, Logger
@@ -197,17 +200,9 @@ def full_check(w_dir_main=os.getcwd(), destination_fullcheck="", files="*.json",
     if not isinstance(files, list):
         files = glob.glob(files)
 
-    df_fullcheck = pd.DataFrame(
-        columns=[
-            "file",
-            "program",
-            "grid_type",
-            "level_of_theory",
-            "dispersion",
-            "solvation",
-        ]
-    )
-
+    # the rows are collected in a list and the DataFrame is created once (adding rows
+    # one by one with .loc copies the DataFrame in every iteration)
+    fullcheck_rows = []
     for file in files:
         file_name = os.path.basename(Path(file)).split(".")[0]
         with open(file) as json_file:
@@ -226,14 +221,28 @@ def full_check(w_dir_main=os.getcwd(), destination_fullcheck="", files="*.json",
         # designed to detect G4 calcs
         if level_of_theory == "HF/GFHFB2":
             level_of_theory = "G4"
-        df_fullcheck.loc[len(df_fullcheck.index)] = [
-            file_name,
-            program,
-            grid_type,
-            level_of_theory,
-            dispersion,
-            solvation,
-        ]
+        fullcheck_rows.append(
+            [
+                file_name,
+                program,
+                grid_type,
+                level_of_theory,
+                dispersion,
+                solvation,
+            ]
+        )
+
+    df_fullcheck = pd.DataFrame(
+        fullcheck_rows,
+        columns=[
+            "file",
+            "program",
+            "grid_type",
+            "level_of_theory",
+            "dispersion",
+            "solvation",
+        ],
+    )
 
     fullcheck_file = "--QCORR_Fullcheck_Analysis--.dat"
     fullcheck_txt = "\n-- Full check analysis --"
@@ -296,9 +305,12 @@ def check_isomerization(isom_data, file):
     # load connectivity matrix from the starting points and convert string into matrix
     if not isom_data["Initial csv"].empty:
         filename = file.replace("_" + file.split("_")[-1], "")
-        init_connectivity_string = isom_data["Initial csv"][
+        # the row of the input is located only once, and it's used for both the connectivity
+        # and the TS atoms (iloc is used since the row isn't necessarily the one with index 0)
+        init_row = isom_data["Initial csv"].loc[
             isom_data["Initial csv"]["code_name"] == filename
-        ]["initial_connectiv"][0]
+        ].iloc[0]
+        init_connectivity_string = init_row["initial_connectiv"]
         init_connectivity = json.loads(
             init_connectivity_string.replace(".", ",")
             .replace(",]", "],")
@@ -325,9 +337,7 @@ def check_isomerization(isom_data, file):
         # remove bonds involved in TSs from connectivity matrixes
         if not isom_data["Initial csv"].empty:
             if "TS_atom_idx" in isom_data["Initial csv"].columns:
-                ts_atoms = isom_data["Initial csv"][
-                    isom_data["Initial csv"]["code_name"] == filename
-                ]["TS_atom_idx"][0].split(",")
+                ts_atoms = init_row["TS_atom_idx"].split(",")
                 for i, ts_idx in enumerate(ts_atoms):
                     for j, ts_idx_2 in enumerate(ts_atoms):
                         if j > i:
@@ -370,6 +380,68 @@ def gen_connectivity(isom_data, atom_types_conn, COORDINATES_conn):
     return conn_mat
 
 
+# text markers searched in the reversed loop of get_json_data(). Most of the lines of a
+# Gaussian output contain none of them, so they are skipped with a single regex search
+GAUSSIAN_PROPS_MARKERS = re.compile("|".join(re.escape(marker) for marker in [
+    "E(TD-HF/TD-DFT)",
+    "E(ZPE)=",
+    "G4(0 K)",
+    "ONIOM: extrapolated energy",
+    "S**2 before annihilation",
+    "Full point group",
+    "Stationary point found",
+    "Rotational",
+    "SCF GIAO Magnetic shielding tensor (ppm)",
+]))
+
+
+def hide_cclib_records(record):
+    """
+    Logging filter that drops the records emitted from the cclib package (its writers use
+    the root logger)
+    """
+
+    return "cclib" not in Path(record.pathname).parts
+
+
+def write_cclib_json(self, file):
+    """
+    Parses a QM output file with cclib and writes the json file in the working directory,
+    with the same output as ccwrite from command lines ("ccwrite json FILE") but without
+    launching a new Python process for every file. If cclib can't read the file, the
+    json file is not created and the error is returned (None otherwise), so the caller
+    writes a single message after its last attempt.
+    """
+
+    # the warnings from cclib and Open Babel (used by cclib for the InChI) were hidden
+    # with capture_output when running ccwrite as a separate process. They are only
+    # silenced while cclib runs, and the previous settings are restored afterwards
+    try:
+        from openbabel import openbabel
+        ob_error_log = openbabel.obErrorLog
+        previous_ob_level = ob_error_log.GetOutputLevel()
+        ob_error_log.SetOutputLevel(openbabel.obError)
+    except ImportError:
+        ob_error_log = None
+    root_logger = logging.getLogger()
+    root_logger.addFilter(hide_cclib_records)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parser = cclib.io.ccopen(file, loglevel=logging.CRITICAL)
+            if not parser:
+                return
+            data = parser.parse()
+            json_name = f"{os.path.splitext(os.path.basename(file))[0]}.json"
+            cclib.io.ccwrite(data, "json", json_name, indices=-1, terse=False, jobfilename=file)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    finally:
+        root_logger.removeFilter(hide_cclib_records)
+        if ob_error_log is not None:
+            ob_error_log.SetOutputLevel(previous_ob_level)
+
+
 def get_json_data(self, file, cclib_data):
     """
     Get metadata and GoodVibes data for the json file (for older versions of cclib)
@@ -479,6 +551,9 @@ def get_json_data(self, file, cclib_data):
 
         # Extract <S**2> before and after spin annihilation, energy, and convergence in freq calc
         for i in reversed(range(0, len(outlines) - 30)):
+            if not GAUSSIAN_PROPS_MARKERS.search(outlines[i]):
+                continue
+
             # For time dependent (TD) calculations
             if "E(TD-HF/TD-DFT)" in outlines[i]:
                 td_e = float(outlines[i].strip().split()[-1])
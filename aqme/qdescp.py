@@ -479,37 +479,35 @@ class qdescp:
             if 'code_name' not in input_df.columns:
                 self.args.log.write(f"\nx  The input csv_name provided ({self.args.csv_name}) does not contain the code_name column. A combined database for AQME-{name_db} workflows will not be created.")
             elif 'SMILES' in input_df.columns:
+                # names used by QDESCP for each molecule of the input CSV
+                name_suffixes = ['_rdkit', '', '_0_rdkit', '_1_rdkit', '_2_rdkit']
+                qdescp_dfs = [qdescp_df, qdescp_denovo_df, qdescp_interpret_df]
+
+                # map every code_name to its rows once, so the molecules are found with
+                # dict lookups instead of comparing the whole code_name columns each time
+                name_positions = []
+                for df in qdescp_dfs:
+                    positions = {}
+                    for pos, code_name in enumerate(df['code_name']):
+                        positions.setdefault(code_name, []).append(pos)
+                    name_positions.append(positions)
+
+                combined_rows = [[], [], []]
                 for i, input_name in enumerate(input_df['code_name']):
-                    # concatenate with qdescp_df
                     qdescp_col = input_df.loc[i].to_frame().T.reset_index(drop=True)
-                    input_col = qdescp_df.loc[(qdescp_df['code_name'] == f'{input_name}_rdkit') | 
-                                            (qdescp_df['code_name'] == f'{input_name}') | 
-                                            (qdescp_df['code_name'] == f'{input_name}_0_rdkit') | 
-                                            (qdescp_df['code_name'] == f'{input_name}_1_rdkit') | 
-                                            (qdescp_df['code_name'] == f'{input_name}_2_rdkit')]
-                    input_col = input_col.drop(['code_name'], axis=1).reset_index(drop=True)
-                    combined_row = pd.concat([qdescp_col, input_col], axis=1)
-                    combined_df = pd.concat([combined_df, combined_row], ignore_index=True)
-
-                    # concatenate with  qdescp_denovo_df
-                    input_col_denovo = qdescp_denovo_df.loc[(qdescp_denovo_df['code_name'] == f'{input_name}_rdkit') | 
-                                                            (qdescp_denovo_df['code_name'] == f'{input_name}') | 
-                                                            (qdescp_denovo_df['code_name'] == f'{input_name}_0_rdkit') | 
-                                                            (qdescp_denovo_df['code_name'] == f'{input_name}_1_rdkit') | 
-                                                            (qdescp_denovo_df['code_name'] == f'{input_name}_2_rdkit')]
-                    input_col_denovo = input_col_denovo.drop(['code_name'], axis=1).reset_index(drop=True)
-                    combined_row_denovo = pd.concat([qdescp_col, input_col_denovo], axis=1)
-                    combined_denovo_df = pd.concat([combined_denovo_df, combined_row_denovo], ignore_index=True)
-
-                    # concatenate with qdescp_interpret_df
-                    input_col_interpret = qdescp_interpret_df.loc[(qdescp_interpret_df['code_name'] == f'{input_name}_rdkit') | 
-                                                                (qdescp_interpret_df['code_name'] == f'{input_name}') | 
-                                                                (qdescp_interpret_df['code_name'] == f'{input_name}_0_rdkit') | 
-                                                                (qdescp_interpret_df['code_name'] == f'{input_name}_1_rdkit') | 
-                                                                (qdescp_interpret_df['code_name'] == f'{input_name}_2_rdkit')]
-                    input_col_interpret = input_col_interpret.drop(['code_name'], axis=1).reset_index(drop=True)
-                    combined_row_interpret = pd.concat([qdescp_col, input_col_interpret], axis=1)
-                    combined_interpret_df = pd.concat([combined_interpret_df, combined_row_interpret], ignore_index=True)
+                    # concatenate with qdescp_df, qdescp_denovo_df and qdescp_interpret_df
+                    for df, positions, rows in zip(qdescp_dfs, name_positions, combined_rows):
+                        match_pos = sorted(
+                            pos for suffix in name_suffixes for pos in positions.get(f'{input_name}{suffix}', [])
+                        )
+                        input_col = df.iloc[match_pos].drop(['code_name'], axis=1).reset_index(drop=True)
+                        rows.append(pd.concat([qdescp_col, input_col], axis=1))
+
+                # the rows are concatenated only once to avoid copying the databases in every iteration
+                if len(input_df) > 0:
+                    combined_df, combined_denovo_df, combined_interpret_df = [
+                        pd.concat(rows, ignore_index=True) for rows in combined_rows
+                    ]
 
                 csv_basename = os.path.basename(self.args.csv_name)
                 csv_path = self.args.initial_dir.joinpath(f'AQME-{name_db}_full_{csv_basename}')
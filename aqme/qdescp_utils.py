@@ -16,7 +16,7 @@ from rdkit.Chem import Descriptors
 import warnings
 warnings.filterwarnings('ignore')
 from morfeus import SASA, Dispersion, BuriedVolume, ConeAngle, SolidAngle, Pyramidalization, read_xyz, read_geometry
-from aqme.utils import load_sdf, periodic_table
+from aqme.utils import load_sdf, PERIODIC_TABLE_SET
 
 GAS_CONSTANT = 8.3144621  # J / K / mol
 J_TO_AU = 4.184 * 627.509541 * 1000.0  # UNIT CONVERSION
@@ -42,25 +42,17 @@ def get_boltz(energy):
     weights (list of floats): List of Boltzmann weights corresponding to the input energies.
     """
     # Shift energies so that the minimum energy is zero (to prevent negative exponents from dominating)
-    energ = [number - min(energy) for number in energy]
+    energ = np.asarray(energy, dtype=float)
+    energ = energ - energ.min()
 
-    boltz_sum = 0.0 # Initialize the sum of Boltzmann factors to zero
+    # Apply the Boltzmann factor formula to all the energies at once: exp(-energy / (k * T))
+    # where J_TO_AU is a conversion factor, GAS_CONSTANT is the gas constant, and T is temperature
+    boltz_factors = np.exp(-energ * J_TO_AU / GAS_CONSTANT / T)
 
-    # Calculate the sum of Boltzmann factors for all energies
-    for e in energ:
-        # Apply the Boltzmann factor formula: exp(-energy / (k * T))
-        # where J_TO_AU is a conversion factor, GAS_CONSTANT is the gas constant, and T is temperature
-        boltz_sum += math.exp(-e * J_TO_AU / GAS_CONSTANT / T)
-    
-    weights = [] # Initialize the list to store Boltzmann weights
-
-    # Calculate each individual Boltzmann weight by normalizing with the total sum of Boltzmann factors
-    for e in energ:
-        weight = math.exp(-e * J_TO_AU / GAS_CONSTANT / T) / boltz_sum
-        weights.append(weight)
+    # Normalize with the total sum of Boltzmann factors and return the list of weights
+    weights = boltz_factors / boltz_factors.sum()
 
-    # Return the list of normalized Boltzmann weights
-    return weights
+    return weights.tolist()
 
 
 def get_boltz_props_nmr(json_files,name,boltz_dir,self,atom_props,nmr_atoms=None,nmr_slope=None,nmr_intercept=None,nmr_experim=None):
@@ -255,18 +247,13 @@ def average_prop_mol(weights, prop):
     boltz_avg (float): Boltzmann-weighted average of the molecular properties, rounded to 4 decimal places.
     """
     
-    # Initialize the Boltzmann-weighted average to 0.0
-    boltz_avg = 0.0
-    
-    # Loop through each property and its corresponding weight
-    for i, p in enumerate(prop):
-        # If the property is 'NaN', break the loop and return 'NaN'
-        if str(p).lower() == 'nan' or p is None:
-            boltz_avg = np.nan
-            break
-        # Otherwise, calculate the weighted sum of properties
-        boltz_avg += p * weights[i]
-    
+    # If any property is 'NaN', return 'NaN'
+    if any(str(p).lower() == 'nan' or p is None for p in prop):
+        return np.nan
+
+    # Otherwise, calculate the weighted sum of properties in a single dot product
+    boltz_avg = float(np.dot(weights[:len(prop)], prop)) if len(prop) > 0 else 0.0
+
     # If the result is a valid number, round it to 4 decimal places
     if str(boltz_avg).lower() != 'nan':
         boltz_avg = round(boltz_avg, 4)
@@ -1156,19 +1143,21 @@ def full_level_boltz(descp_dict,json_files,energy,smarts_targets,full_json_data)
     # Calculate Boltzmann weights
     boltz = get_boltz(energy)
 
+    # Read the json files only once, instead of once per property
+    json_datas = [read_json(json_file) for json_file in json_files]
+
     # Get weighted atomic properties
     atomic_props = False
     for i, prop in enumerate(descp_dict['atom_props']):
         if i == 0:  # Filter to ensure all molecules have atomic properties for qdescp_atoms option
-            for json_file in json_files:
-                json_data = read_json(json_file)
+            for json_data in json_datas:
                 for atom_prop in descp_dict['atom_props']:
                     if atom_prop in json_data:
                         atomic_props = True
                         break
         if atomic_props:
             try:
-                prop_list = [read_json(json_file)[prop] for json_file in json_files]
+                prop_list = [json_data[prop] for json_data in json_datas]
                 avg_prop = average_properties(boltz, prop_list)
             except KeyError:
                 full_json_data[prop] = np.nan
@@ -1180,7 +1169,7 @@ def full_level_boltz(descp_dict,json_files,energy,smarts_targets,full_json_data)
     # Get weighted molecular properties from XTB
     for prop in descp_dict['mol_props']:
         try:
-            prop_list = [read_json(json_file)[prop] for json_file in json_files]
+            prop_list = [json_data[prop] for json_data in json_datas]
             avg_prop = average_properties(boltz, prop_list, is_atom_prop=False)
             full_json_data[prop] = avg_prop
         except KeyError:
@@ -1561,7 +1550,7 @@ def get_prefix_atom_props(sorted_indices,mol,pattern,smarts_targets,idx_set):
             match_name = f'Atom_{pattern}'
         else:
             # If it's a SMARTS pattern or more than one atom
-            if len(smarts_targets) == 1 and pattern in periodic_table():
+            if len(smarts_targets) == 1 and pattern in PERIODIC_TABLE_SET:
                 # Case where it's just an atom type without SMARTS
                 if n_atoms_of_type == 1:
                     match_name = f'{atom_type}'
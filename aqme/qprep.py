@@ -62,19 +62,20 @@ Parameters
 ######################################################.
 
 import os
+import re
 import subprocess
 import sys
 import glob
 import time
 import json
 import pandas as pd
+import numpy as np
 from pkg_resources import resource_filename
 
 from aqme.utils import (
     cclib_atoms_coords,
     QM_coords,
     read_file,
-    move_file,
     load_variables,
     read_xyz_charge_mult,
     mol_from_sdf_or_mol_or_mol2,
@@ -90,6 +91,9 @@ from rdkit import Chem
 
 TEMPLATES_PATH = Path(resource_filename("aqme", "templates"))
 
+# memory option with optional units (i.e. 4GB, 4000MB, 4 gb), compiled only once
+ORCA_MEM_PATTERN = re.compile(r"\s*(\d+(?:\.\d+)?)\s*(GB|MB|MW)?\s*", re.IGNORECASE)
+
 class qprep:
     """
     Class containing all the functions from the QPREP module related to Gaussian input files
@@ -102,8 +106,15 @@ class qprep:
         # load default and user-specified variables
         self.args = load_variables(kwargs, "qprep", create_dat=create_dat)
 
-        # check whether dependencies are installed
-        _ = check_dependencies(self)
+        # tails of the input files, generated in get_tail() only once for each set of elements
+        self.tail_cache = {}
+        # %maxcore/%pal lines of ORCA inputs, generated in get_header() only once
+        self.orca_settings = None
+
+        # check whether dependencies are installed. When QPREP is called internally for every
+        # file (i.e. from QCORR with create_dat=False), the parent module already checked them
+        if create_dat:
+            _ = check_dependencies(self)
 
         # retrieves the different files to run in QPREP
         _ = check_files(self,'qprep')
@@ -159,37 +170,30 @@ class qprep:
             if file_format.lower() in ["sdf", "xyz", "pdb"]:
                 sdf_files = []
                 if file_format.lower() == "xyz":
+                    # the conversion of the individual XYZ files is done in-process with pybel
+                    # to avoid launching one obabel process per conformer
+                    from openbabel import pybel
+
                     # separate the parent XYZ file into individual XYZ files
                     xyzall_2_xyz(file, f"{self.args.w_dir_main}/{name}")
                     for conf_file in glob.glob(
                         f"{self.args.w_dir_main}/{name}_conf_*.xyz"
                     ):
-                        if self.args.charge is None:
-                            charge_xyz, _ = read_xyz_charge_mult(conf_file)
-                        else:
-                            charge_xyz = self.args.charge
-                        if self.args.mult is None:
-                            _, mult_xyz = read_xyz_charge_mult(conf_file)
-                        else:
-                            mult_xyz = self.args.mult
+                        # the XYZ file is only read once, even if both charge and mult are missing
+                        charge_xyz, mult_xyz = self.args.charge, self.args.mult
+                        if charge_xyz is None or mult_xyz is None:
+                            charge_file, mult_file = read_xyz_charge_mult(conf_file)
+                            if charge_xyz is None:
+                                charge_xyz = charge_file
+                            if mult_xyz is None:
+                                mult_xyz = mult_file
                         # generate SDF files from XYZ with Openbabel
-                        command_xyz = [
-                            "obabel",
-                            "-ixyz",
-                            conf_file,
-                            "-osdf",
-                            f"-O{conf_file.split('.xyz')[0]}.sdf",
-                            "--property",
-                            f"Real charge={str(charge_xyz)}",
-                            ";",
-                            f"Mult={str(mult_xyz)}",
-                        ]
-                        subprocess.run(
-                            command_xyz,
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL,
-                        )
-                        sdf_files.append(f"{conf_file.split('.xyz')[0]}.sdf")
+                        ob_mol = next(pybel.readfile("xyz", conf_file))
+                        ob_mol.data["Real charge"] = str(charge_xyz)
+                        ob_mol.data["Mult"] = str(mult_xyz)
+                        sdf_conf = f"{conf_file.split('.xyz')[0]}.sdf"
+                        ob_mol.write("sdf", sdf_conf, overwrite=True)
+                        sdf_files.append(sdf_conf)
                         # delete individual XYZ files
                         os.remove(conf_file)
 
@@ -243,9 +247,8 @@ class qprep:
                     "mult": mult,
                     "name": name,
                 }
-                comfile = self.write(qprep_data)
+                self.write(qprep_data, destination)
 
-                move_file(destination, self.args.w_dir_main, comfile)
                 if create_dat:
                     self.args.log.write(f"o  {name} successfully processed at {destination}")
 
@@ -289,8 +292,7 @@ class qprep:
                 "name": name_conf,
             }
 
-            comfile = self.write(qprep_data)
-            move_file(destination, self.args.w_dir_main, comfile)
+            self.write(qprep_data, destination)
 
     def get_header(self, qprep_data):
         """
@@ -301,53 +303,78 @@ class qprep:
         name_file = add_prefix_suffix(qprep_data["name"], self.args)
 
         if self.args.program.lower() == "gaussian":
-            if self.args.chk_path != '':
-                txt += f'%chk={self.args.chk_path}\n'
-            elif self.args.chk:
-                txt += f'%chk={name_file}.chk\n'
-            if self.args.oldchk_path != '':
-                txt += f'%oldchk={self.args.oldchk_path}\n'
-            elif self.args.oldchk:
-                txt += f'%oldchk={name_file}.chk\n'
-            txt += f"%nprocshared={self.args.nprocs}\n"
-            txt += f"%mem={self.args.mem}\n"
-            if self.args.qm_input[:2] not in ['p ','P ']:
-                txt += f"# {self.args.qm_input}\n\n"
-            else: # for #p in Gaussian inputs
-                txt += f"#{self.args.qm_input}\n\n"
-            txt += f'{name_file}\n\n'
-            txt += f'{qprep_data["charge"]} {qprep_data["mult"]}\n'
+            lines = []
+            chk_file = self.args.chk_path or (f'{name_file}.chk' if self.args.chk else '')
+            if chk_file != '':
+                lines.append(f'%chk={chk_file}')
+            oldchk_file = self.args.oldchk_path or (f'{name_file}.chk' if self.args.oldchk else '')
+            if oldchk_file != '':
+                lines.append(f'%oldchk={oldchk_file}')
+            # for #p in Gaussian inputs, no space is added after #
+            route_sep = '' if self.args.qm_input[:2] in ['p ','P '] else ' '
+            lines += [
+                f"%nprocshared={self.args.nprocs}",
+                f"%mem={self.args.mem}",
+                f"#{route_sep}{self.args.qm_input}",
+                "",
+                name_file,
+                "",
+                f'{qprep_data["charge"]} {qprep_data["mult"]}',
+            ]
+            txt += "\n".join(lines) + "\n"
 
         elif self.args.program.lower() == "orca":
-            txt += f'# {name_file}\n'
-            if "GB" in self.args.mem:
-                mem_orca = int(self.args.mem.split("GB")[0]) * 1000
-            elif "MB" in self.args.mem:
-                mem_orca = self.args.mem.split("MB")[0]
-            elif "MW" in self.args.mem:
-                mem_orca = self.args.mem.split("MW")[0]
-            else:
-                mem_orca = self.args.mem
-            if '%maxcore' not in self.args.qm_input:
-                txt += f"%maxcore {mem_orca}\n"
-            pal_included = False
-            pal_list = ['%pal','pal1','pal3','pal3','pal4','pal5','pal6','pal7','pal8']
-            for keyword in self.args.qm_input.split():
-                if keyword.rstrip("\n").lower() in pal_list:
-                    pal_included = True
-            if not pal_included:
-                txt += f"%pal nprocs {self.args.nprocs} end\n"
-            txt += f"! {self.args.qm_input}\n"
-            txt += f'* xyz {qprep_data["charge"]} {qprep_data["mult"]}\n'
+            # only the title, charge and mult change between ORCA inputs
+            if self.orca_settings is None:
+                self.orca_settings = self.get_orca_settings()
+            lines = [f'# {name_file}', *self.orca_settings]
+            lines += [
+                f"! {self.args.qm_input}",
+                f'* xyz {qprep_data["charge"]} {qprep_data["mult"]}',
+            ]
+            txt += "\n".join(lines) + "\n"
 
         return txt
 
+    def get_orca_settings(self):
+        """
+        Gets the %maxcore and %pal lines of ORCA inputs (unless they are included in qm_input).
+        """
+
+        settings = []
+        # %maxcore is given in MB, so GB are converted (i.e. 4GB or 4 gb to 4000)
+        mem_match = ORCA_MEM_PATTERN.fullmatch(str(self.args.mem))
+        if mem_match is None:
+            mem_orca = self.args.mem
+        elif (mem_match.group(2) or "").upper() == "GB":
+            mem_orca = int(float(mem_match.group(1)) * 1000)
+        else:
+            mem_orca = mem_match.group(1)
+        if '%maxcore' not in self.args.qm_input:
+            settings.append(f"%maxcore {mem_orca}")
+        pal_keywords = {'%pal','pal1','pal2','pal3','pal4','pal5','pal6','pal7','pal8'}
+        pal_included = any(
+            keyword.lower() in pal_keywords for keyword in self.args.qm_input.split()
+        )
+        if not pal_included:
+            settings.append(f"%pal nprocs {self.args.nprocs} end")
+
+        return settings
+
 
     def get_tail(self, qprep_data):
         """
         Gets the part of the input file below the molecular coordinates.
         """
 
+        # the tail only depends on the QPREP options and, for Gen/GenECP, on the elements of
+        # the molecule, so it's reused for all the conformers with the same elements
+        tail_key = None
+        if self.args.gen_atoms != [] and len(self.args.gen_atoms) > 0:
+            tail_key = tuple(dict.fromkeys(qprep_data["atom_types"]))
+        if tail_key in self.tail_cache:
+            return self.tail_cache[tail_key]
+
         txt = ""
         # if the radius is modified for SMD, it has to be after the genecp info
         modifysph_line = "" 
@@ -382,36 +409,33 @@ class qprep:
                 if self.args.qm_input.lower().find("genecp") > -1:
                     gen_type = "genecp"
 
-                for _, element_ecp in enumerate(qprep_data["atom_types"]):
-                    if (
-                        element_ecp in self.args.gen_atoms
-                        and element_ecp not in ecp_used
-                    ):
+                # unique elements in order of appearance, then split with O(1) set lookups
+                gen_atoms = frozenset(self.args.gen_atoms)
+                for element_ecp in dict.fromkeys(qprep_data["atom_types"]):
+                    if element_ecp in gen_atoms:
                         ecp_used.append(element_ecp)
-                    elif (
-                        element_ecp not in self.args.gen_atoms
-                        and element_ecp not in ecp_not_used
-                    ):
+                    else:
                         ecp_not_used.append(element_ecp)
 
+                gen_lines = []
                 if len(ecp_not_used) > 0:
-                    elements_not_used = " ".join([f"{sym}" for sym in ecp_not_used])
-                    txt += f"{elements_not_used} 0\n{self.args.bs_nogen}\n****\n"
+                    elements_not_used = " ".join(ecp_not_used)
+                    gen_lines += [f"{elements_not_used} 0", self.args.bs_nogen, "****"]
                 if len(ecp_used) > 0:
-                    elements_used = " ".join([f"{sym}" for sym in ecp_used])
-                    txt += f"{elements_used} 0\n{self.args.bs_gen}\n****\n"
+                    elements_used = " ".join(ecp_used)
+                    gen_lines += [f"{elements_used} 0", self.args.bs_gen, "****"]
 
                 if gen_type == "genecp" and len(ecp_used) > 0:
-                    txt += "\n"
-                    txt += f"{elements_used} 0\n{self.args.bs_gen}\n"
+                    gen_lines += ["", f"{elements_used} 0", self.args.bs_gen]
 
-                txt += "\n"
+                txt += "".join(f"{line}\n" for line in gen_lines) + "\n"
                 
         txt = txt.lstrip('\n')
         txt += modifysph_line
+        self.tail_cache[tail_key] = txt
         return txt
         
-    def write(self, qprep_data):
+    def write(self, qprep_data, destination):
 
         if self.args.program.lower() == "gaussian":
             extension = "com"
@@ -421,34 +445,28 @@ class qprep:
         name_file = add_prefix_suffix(qprep_data["name"], self.args)
         comfile = f'{name_file}.{extension}'
 
-        if os.path.exists(self.args.w_dir_main / comfile):
-            os.remove(self.args.w_dir_main / comfile)
-
         header = self.get_header(qprep_data)
         tail = self.get_tail(qprep_data)
 
-        fileout = open(self.args.w_dir_main / comfile, "w")
-        fileout.write(header)
-
-        for atom_idx in range(0, len(qprep_data["atom_types"])):
-            fileout.write(
-                "{0:>2} {1:12.8f} {2:12.8f} {3:12.8f}".format(
-                    qprep_data["atom_types"][atom_idx],
-                    qprep_data["cartesians"][atom_idx][0],
-                    qprep_data["cartesians"][atom_idx][1],
-                    qprep_data["cartesians"][atom_idx][2],
-                )
-            )
-            if atom_idx != len(qprep_data["atom_types"]) - 1:
-                fileout.write("\n")
+        # the whole input is assembled in memory and written with a single call
+        # (the coordinates are converted to Python floats in one step, which are faster
+        # to format than NumPy floats)
+        xyz_coords = np.atleast_2d(np.asarray(qprep_data["cartesians"], dtype=float))[:, :3].tolist()
+        coords = "\n".join(
+            f"{atom:>2} {x:12.8f} {y:12.8f} {z:12.8f}"
+            for atom, (x, y, z) in zip(qprep_data["atom_types"], xyz_coords)
+        )
 
         if self.args.program.lower() == "gaussian":
-            fileout.write("\n\n")
+            coords_end = "\n\n"
         elif self.args.program.lower() == "orca":
-            fileout.write("\n*")
+            coords_end = "\n*"
 
-        fileout.write(tail)
-        fileout.close()
+        # the input goes straight to its final folder (no temporary copy in w_dir_main
+        # that has to be moved afterwards for every conformer)
+        destination.mkdir(exist_ok=True, parents=True)
+        with open(destination / comfile, "w") as fileout:
+            fileout.write(f"{header}{coords}{coords_end}{tail}")
 
         return comfile
 
@@ -461,24 +479,23 @@ class qprep:
         charge, mult = None, None
         if self.args.atom_types == [] or self.args.cartesians == []:
             if mol is not None:
-                atom_types = []
-                atom_data = [(atom, atom.GetIsotope()) for atom in mol.GetAtoms()]
-                for atom, isotope in atom_data:
-                    if isotope:
-                        atom_types.append(atom.GetSymbol() + "(iso={})".format(isotope))
-                    else:
-                        atom_types.append(atom.GetSymbol())
+                # isotopes are labelled directly in the Gaussian format (i.e. H(iso=2))
+                atom_types = [
+                    f"{atom.GetSymbol()}(iso={atom.GetIsotope()})"
+                    if atom.GetIsotope()
+                    else atom.GetSymbol()
+                    for atom in mol.GetAtoms()
+                ]
                 cartesians = mol.GetConformers()[0].GetPositions()
-                try:
+                # charge and mult from the SDF properties, or from the mol when they're missing
+                if mol.HasProp("Real charge"):
                     charge = int(mol.GetProp("Real charge"))
-                except KeyError:
+                else:
                     charge = Chem.GetFormalCharge(mol)
-                try:
+                if mol.HasProp("Mult"):
                     mult = int(mol.GetProp("Mult"))
-                except KeyError:
-                    NumRadicalElectrons = 0
-                    for Atom in mol.GetAtoms():
-                        NumRadicalElectrons += Atom.GetNumRadicalElectrons()
+                else:
+                    NumRadicalElectrons = sum(Atom.GetNumRadicalElectrons() for Atom in mol.GetAtoms())
                     TotalElectronicSpin = NumRadicalElectrons / 2
                     mult = int((2 * TotalElectronicSpin) + 1)
 
@@ -4,7 +4,9 @@
 ######################################################.
 
 import os
+import io
 import re
+import mmap
 import subprocess
 import sys
 import time
@@ -12,6 +14,7 @@ import getopt
 import glob
 import yaml
 import ast
+import numpy as np
 from pathlib import Path
 from rdkit.Chem.rdMolAlign import GetBestRMS
 from rdkit.Chem.rdmolops import RemoveHs
@@ -60,6 +63,16 @@ def periodic_table():
     return periodic_table
 
 
+# element symbols indexed by atomic number, built only once per process
+PERIODIC_TABLE = tuple(periodic_table())
+
+# set of element symbols for O(1) membership checks (i.e., when filtering unknown atoms)
+PERIODIC_TABLE_SET = frozenset(PERIODIC_TABLE)
+
+# atomic number of each element symbol
+ATOMIC_NUMBERS = {symbol: atomic_number for atomic_number, symbol in enumerate(PERIODIC_TABLE) if symbol != ""}
+
+
 # load paramters from yaml file
 def load_from_yaml(self):
     """
@@ -169,13 +182,13 @@ def set_destination(self,module):
 
 def get_info_input(file):
     """
-    Takes an input file and retrieves the coordinates of the atoms and the
-    total charge.
+    Takes an input file and retrieves the coordinates of the atoms, the
+    total charge and the multiplicity.
 
     Parameters
     ----------
     file : str or pathlib.Path
-        A path pointing to a valid .com or .gjf file
+        A path pointing to a valid .com, .gjf or .inp file
 
     Returns
     -------
@@ -183,6 +196,8 @@ def get_info_input(file):
         A list of strings (without \\n) that contain the xyz coordinates of the .gjf or .com file
     charge : str
         A str with the number corresponding to the total charge of the .com or .gjf file
+    mult : str
+        A str with the number corresponding to the multiplicity of the .com or .gjf file
     """
 
     with open(file, "r") as input_file:
@@ -221,11 +236,11 @@ def get_info_input(file):
     if os.path.basename(Path(file)).split(".")[-1] == "inp":
 
         # Find the line with charge and multiplicity
-        while "* xyz" not in line or "* int" not in line:
+        while "* xyz" not in line and "* int" not in line:
             line = next(_iter)
 
         # Read charge and multiplicity
-        charge = line.strip().split()[-2]
+        charge, mult = line.strip().split()[-2:]
 
         # Store the coordinates until next *
         atoms_and_coords = []
@@ -250,15 +265,55 @@ def set_metal_atomic_number(mol, metal_idx, metal_sym):
         sorted list (same order as metal_idx) that contains the symbols of the metals in the molecule
     """
 
-    for atom in mol.GetAtoms():
-        if atom.GetIdx() in metal_idx:
-            re_symbol = metal_sym[metal_idx.index(atom.GetIdx())]
-            atomic_number = periodic_table().index(re_symbol)
-            atom.SetAtomicNum(atomic_number)
-            atom.SetFormalCharge(0)
+    # only the metal atoms are visited, instead of looping over all the atoms
+    for idx, re_symbol in zip(metal_idx, metal_sym):
+        if idx is None:
+            continue
+        atom = mol.GetAtomWithIdx(idx)
+        atom.SetAtomicNum(ATOMIC_NUMBERS[re_symbol])
+        atom.SetFormalCharge(0)
+
+
+def get_rms_maps(mol, heavy, max_matches_rmsd):
+    """
+    Generates the atom mappings (symmetry-equivalent atom orders) that GetBestRMS() searches
+    for in every call, so they can be reused when many conformers of the same molecule are
+    compared. As in GetBestRMS(), conjugated terminal groups (i.e. carboxylates and nitro
+    groups) are considered symmetric.
+
+    Parameters
+    ----------
+    mol : rdkit.Chem.Mol
+        Molecule used to generate the mappings
+    heavy : bool
+        If True it will ignore the H atoms (same atoms used in get_conf_RMS)
+    max_matches_rmsd : int
+        Max number of matches found in a SubstructMatch()
 
+    Returns
+    -------
+    list
+        List of lists of (probe atom, reference atom) tuples, used with the map option of GetBestRMS()
+    """
 
-def get_conf_RMS(mol1, mol2, c1, c2, heavy, max_matches_rmsd):
+    if heavy:
+        mol = RemoveHs(mol)
+    sym_mol = Chem.RWMol(mol)
+    for atom in sym_mol.GetAtoms():
+        if atom.GetDegree() == 1 and atom.GetSymbol() in ["O", "N"]:
+            neighbor = atom.GetNeighbors()[0]
+            n_terminal = sum(1 for atom_nb in neighbor.GetNeighbors() if atom_nb.GetDegree() == 1 and atom_nb.GetSymbol() == atom.GetSymbol())
+            if n_terminal > 1:
+                bond = sym_mol.GetBondBetweenAtoms(atom.GetIdx(), neighbor.GetIdx())
+                bond.SetBondType(Chem.BondType.SINGLE)
+                bond.SetIsAromatic(False)
+                atom.SetFormalCharge(0)
+    matches = sym_mol.GetSubstructMatches(sym_mol, uniquify=False, useChirality=False, maxMatches=max_matches_rmsd)
+
+    return [list(enumerate(match)) for match in matches]
+
+
+def get_conf_RMS(mol1, mol2, c1, c2, heavy, max_matches_rmsd, rms_maps=None):
     """
     Takes in two rdkit.Chem.Mol objects and calculates the RMSD between them.
     (As side efect mol1 is left in the aligned state, if heavy is specified
@@ -278,6 +333,8 @@ def get_conf_RMS(mol1, mol2, c1, c2, heavy, max_matches_rmsd):
         If True it will ignore the H atoms when computing the RMSD
     max_matches_rmsd : int
         Max number of matches found in a SubstructMatch()
+    rms_maps : list, default=None
+        Atom mappings from get_rms_maps(). If None, GetBestRMS generates them
 
     Returns
     -------
@@ -288,7 +345,7 @@ def get_conf_RMS(mol1, mol2, c1, c2, heavy, max_matches_rmsd):
     if heavy:
         mol1 = RemoveHs(mol1)
         mol2 = RemoveHs(mol2)
-    return GetBestRMS(mol1, mol2, c1, c2, maxMatches=max_matches_rmsd, numThreads=1) # numThreads must be 1, otherwise it either fails or becomes VERY slow
+    return GetBestRMS(mol1, mol2, c1, c2, map=rms_maps, maxMatches=max_matches_rmsd, numThreads=1) # numThreads must be 1, otherwise it either fails or becomes VERY slow
 
 
 def command_line_args():
@@ -578,21 +635,63 @@ def read_file(initial_dir, w_dir, file):
     """
 
     os.chdir(w_dir)
-    outfile = open(file, "r")
-    outlines = outfile.readlines()
-    outfile.close()
+    with open(file, "r") as outfile:
+        outlines = outfile.readlines()
     os.chdir(initial_dir)
 
     return outlines
 
 
+def read_file_tail(initial_dir, w_dir, file, n_lines):
+    """
+    Retrieves a list with only the last n_lines lines of a file. The file is memory-mapped
+    and the last newlines are located with rfind() from the end, so the lines before them
+    are never read.
+    """
+
+    os.chdir(w_dir)
+    with open(file, "rb") as F:
+        if os.fstat(F.fileno()).st_size == 0:
+            os.chdir(initial_dir)
+            return []
+        with mmap.mmap(F.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # a newline at the very end closes the last line, it doesn't start a new one
+            search_end = len(mm) - 1 if mm[-1:] == b"\n" else len(mm)
+            start = 0
+            for _ in range(n_lines):
+                newline_pos = mm.rfind(b"\n", 0, search_end)
+                if newline_pos == -1:
+                    start = 0
+                    break
+                start = newline_pos + 1
+                search_end = newline_pos
+            tail = mm[start:].decode()
+    os.chdir(initial_dir)
+
+    # same line splitting and newline translation as iterating over a file opened with "r"
+    return list(io.StringIO(tail, newline=None))
+
+
+def atomic_numbers_to_symbols(atom_numbers):
+    """
+    Converts atomic numbers into element symbols ("XX" for unknown atomic numbers). Only
+    the different atomic numbers are looked up in the periodic table.
+    """
+
+    symbols = {
+        atom_n: PERIODIC_TABLE[atom_n] if atom_n < len(PERIODIC_TABLE) else "XX"
+        for atom_n in set(atom_numbers)
+    }
+
+    return [symbols[atom_n] for atom_n in atom_numbers]
+
+
 def QM_coords(outlines, min_RMS, n_atoms, program, keywords_line):
     """
     Retrieves atom types and coordinates from QM output files
     """
 
     atom_types, cartesians, range_lines = [], [], []
-    per_tab = periodic_table()
     count_RMS = -1
 
     if program == "gaussian":
@@ -614,20 +713,12 @@ def QM_coords(outlines, min_RMS, n_atoms, program, keywords_line):
                     range_lines = [i + 5, i + 5 + n_atoms]
                     break
         if len(range_lines) != 0:
-            for i in range(range_lines[0], range_lines[1]):
-                massno = int(outlines[i].split()[1])
-                if massno < len(per_tab):
-                    atom_symbol = per_tab[massno]
-                else:
-                    atom_symbol = "XX"
-                atom_types.append(atom_symbol)
-                cartesians.append(
-                    [
-                        float(outlines[i].split()[3]),
-                        float(outlines[i].split()[4]),
-                        float(outlines[i].split()[5]),
-                    ]
-                )
+            # columns of the orientation block: center, atomic number, atomic type, X, Y, Z
+            coords_block = np.loadtxt(
+                outlines[range_lines[0] : range_lines[1]], usecols=(1, 3, 4, 5), ndmin=2
+            )
+            atom_types = atomic_numbers_to_symbols(coords_block[:, 0].astype(int).tolist())
+            cartesians = coords_block[:, 1:].tolist()
 
     return atom_types, cartesians
 
@@ -639,14 +730,7 @@ def cclib_atoms_coords(cclib_data):
     """
 
     atom_numbers = cclib_data["atoms"]["elements"]["number"]
-    atom_types = []
-    per_tab = periodic_table()
-    for atom_n in atom_numbers:
-        if atom_n < len(per_tab):
-            atom_symbol = per_tab[atom_n]
-        else:
-            atom_symbol = "XX"
-        atom_types.append(atom_symbol)
+    atom_types = atomic_numbers_to_symbols(atom_numbers)
 
     cartesians_array = cclib_data["atoms"]["coords"]["3d"]
     cartesians = [
@@ -656,21 +740,24 @@ def cclib_atoms_coords(cclib_data):
     return atom_types, cartesians
 
 
+# patterns of the QCORR run folders (i.e. /failed/run_1/ and /run_1/), compiled only once
+FAILED_RUN_PATTERN = re.compile(
+    r"(^.*)[/\\]failed[/\\]run_(?P<folder_count>\d+)[/\\]"
+)
+RUN_PATTERN = re.compile(r"(^.*)[/\\]run_(?P<folder_count>\d+)[/\\]")
+
+
 def check_run(w_dir):
     """
     Determines the folder where input files are gonna be generated in QCORR.
     """
 
-    failed_run_pattern = re.compile(
-        r"(^.*)[/\\]failed[/\\]run_(?P<folder_count>\d+)[/\\]"
-    )
-
-    run_pattern = re.compile(r"(^.*)[/\\]run_(?P<folder_count>\d+)[/\\]")
     resume_qcorr = False
     folder_count = 1
 
-    failed_run_match = failed_run_pattern.match(w_dir.as_posix())
-    run_match = run_pattern.match(w_dir.as_posix())
+    w_dir_posix = w_dir.as_posix()
+    failed_run_match = FAILED_RUN_PATTERN.match(w_dir_posix)
+    run_match = RUN_PATTERN.match(w_dir_posix)
 
     if failed_run_match:
         folder_count = int(failed_run_match.group("folder_count")) + 1
@@ -712,31 +799,57 @@ def read_xyz_charge_mult(file):
     return charge_xyz, mult_xyz
 
 
+def read_sdf_tags(input_file, tags):
+    """
+    Returns a dictionary with the lines that follow each SDF property tag (i.e. "Energy"
+    for ">  <Energy>"), in the order they appear in the file. The file is memory-mapped
+    and scanned as bytes, so large SDF files are never copied into Python strings.
+    """
+
+    tag_values = {tag: [] for tag in tags}
+    if os.path.getsize(input_file) == 0:
+        return tag_values
+
+    with open(input_file, "rb") as F:
+        with mmap.mmap(F.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for tag in tags:
+                tag_line = f">  <{tag}>".encode()
+                pos = mm.find(tag_line)
+                while pos != -1:
+                    start = mm.find(b"\n", pos)
+                    if start == -1:
+                        break
+                    end = mm.find(b"\n", start + 1)
+                    if end == -1:
+                        end = len(mm)
+                    value = mm[start + 1 : end].rstrip(b"\r").decode()
+                    tag_values[tag].append(value)
+                    pos = mm.find(tag_line, end)
+
+    return tag_values
+
+
 def mol_from_sdf_or_mol_or_mol2(input_file, module, args, low_check=None):
 
     """
     mol object from SDF, MOL or MOL2 files
     """
     if module in ["qprep","cmin"]:
-        # using sanitize=False to avoid reading problems
-        mols = Chem.SDMolSupplier(input_file, removeHs=False, sanitize=False)
+        # using sanitize=False to avoid reading problems. The mols are parsed only once and
+        # kept in a list (indexing a SDMolSupplier parses the mol again in every access)
+        mols = list(Chem.SDMolSupplier(input_file, removeHs=False, sanitize=False))
         # transform invalid SDF files created with GaussView into valid SDF from Open Babel
         if None in mols:
-            mols = load_sdf(input_file)
+            mols = list(load_sdf(input_file))
         if low_check=='lowest_only':
             return [mols[0]]
         elif isinstance(low_check, int):
-            check_n = min(len(mols),low_check)
-            n_mols = []
-            for i in range(check_n):
-                n_mols.append(mols[i])
-            return n_mols
+            return mols[:max(low_check, 0)]
         elif isinstance(low_check, float):
-            n_mols = []
-            for i in range(len(mols)):
-                if abs(float(mols[i].GetProp('Energy')) - float(mols[0].GetProp('Energy'))) < low_check: # kcal/mol
-                    n_mols.append(mols[i])
-            return n_mols
+            # the energy window is applied to all the conformers at once (kcal/mol)
+            energies = np.fromiter((float(mol.GetProp('Energy')) for mol in mols), dtype=float, count=len(mols))
+            keep_idx = np.flatnonzero(np.abs(energies - energies[0]) < low_check)
+            return [mols[i] for i in keep_idx]
         else:
             return mols
 
@@ -758,21 +871,10 @@ def mol_from_sdf_or_mol_or_mol2(input_file, module, args, low_check=None):
         elif extension.lower() == "mol2":
             mols = [Chem.MolFromMol2File(input_file, removeHs=False)]
 
-        IDs, charges, mults = [], [], []
-
-        with open(input_file, "r") as F:
-            lines = F.readlines()
-
-        for i, line in enumerate(lines):
-            if line.find(">  <ID>") > -1:
-                ID = ' '.join(lines[i + 1].split()[:-1])
-                IDs.append(ID)
-            if line.find(">  <Real charge>") > -1:
-                charge = lines[i + 1].split()[0]
-                charges.append(charge)
-            if line.find(">  <Mult>") > -1:
-                mult = lines[i + 1].split()[0]
-                mults.append(mult)
+        sdf_tags = read_sdf_tags(input_file, ["ID", "Real charge", "Mult"])
+        IDs = [' '.join(line.split()[:-1]) for line in sdf_tags["ID"]]
+        charges = [line.split()[0] for line in sdf_tags["Real charge"]]
+        mults = [line.split()[0] for line in sdf_tags["Mult"]]
 
         suppl = []
         for i, mol in enumerate(mols):
@@ -910,16 +1012,18 @@ def get_files(value):
         while('' in value):
             value.remove('')
     new_value = []
+    # the working directory is only retrieved once (it's needed for every file)
+    cwd = os.getcwd()
     for val in value:
         if not isinstance(val, Path):
             if (
             Path(f"{val}").exists()
-            and os.getcwd() not in f"{val}"
+            and cwd not in f"{val}"
             ):
-                new_value.append(f"{os.getcwd()}/{val}")
+                new_value.append(f"{cwd}/{val}")
             elif '*' in val:
-                if os.getcwd() not in f"{val}":
-                    list_of_val = glob.glob(f"{os.getcwd()}/{val}")
+                if cwd not in f"{val}":
+                    list_of_val = glob.glob(f"{cwd}/{val}")
                 else:
                     list_of_val = glob.glob(val)
                 for ele in list_of_val:
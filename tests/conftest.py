@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+######################################################.
+# 		     Shared pytest fixtures 	             #
+######################################################.
+
+import os
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def restore_cwd(monkeypatch):
+    """
+    The tests move into the folders of each module with os.chdir(). monkeypatch sets the
+    initial working directory back after every test, even if the test fails before
+    going back, so a failed test can't break the paths of the next ones
+    """
+
+    monkeypatch.chdir(os.getcwd())
+
+
+def pytest_configure(config):
+    # the slowest cases still run by default, use -m "not slow" for a quick check
+    config.addinivalue_line(
+        "markers", "slow: cases that take much longer than the rest (deselect with -m \"not slow\")"
+    )
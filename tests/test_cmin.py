@@ -50,8 +50,10 @@ def test_cmin_methods(
         cmin(program=program,files=f'{sdf}')
 
 
-    file = f'{cmin_methods_dir}/CMIN/{sdf.split(".")[0]}_{program}.sdf'
-    file2 = f'{cmin_methods_dir}/CMIN/All_confs/{sdf.split(".")[0]}_{program}_all_confs.sdf'
+    name = sdf.split(".")[0]
+    cmin_folder = f'{cmin_methods_dir}/CMIN'
+    file = f'{cmin_folder}/{name}_{program}.sdf'
+    file2 = f'{cmin_folder}/All_confs/{name}_{program}_all_confs.sdf'
 
     assert os.path.exists(file)
     assert os.path.exists(file2)
@@ -9,7 +9,10 @@ import os
 import pytest
 import glob
 from aqme.csearch import csearch
+from aqme.csearch.utils import smi_to_mol
+from aqme.utils import read_sdf_tags
 import rdkit
+from rdkit.Chem import rdMolTransforms
 import shutil
 
 # saves the working directory
@@ -37,6 +40,17 @@ if not os.path.exists(csearch_input_dir):
 if not os.path.exists(csearch_varfile_dir):
     os.mkdir(csearch_varfile_dir)
 
+
+def read_sdf_energies(sdf_file):
+    """
+    Reads the energies of all the conformers from an SDF file (the file is memory-mapped
+    and only the lines after the Energy tags are decoded)
+    """
+
+    energy_lines = read_sdf_tags(sdf_file, ["Energy"])["Energy"]
+    return [float(line.split()[0]) for line in energy_lines]
+
+
 # tests for varfile
 @pytest.mark.parametrize(
     "varfile, nameinvarfile, output_nummols",
@@ -64,7 +78,7 @@ def test_csearch_varfile(varfile, nameinvarfile, output_nummols):
         # tests for conformer generation with RDKit
         ("rdkit", "pentane.smi", [2, 4]),
         ("rdkit", "pentane.csv", [2, 4]),
-        ("rdkit", "Cu.csv", [1, 1, 1]),
+        pytest.param("rdkit", "Cu.csv", [1, 1, 1], marks=pytest.mark.slow),
         ("rdkit", "blank_smi.csv", [1, 1]), # check blank cells
         ("rdkit", "unique_smi.csv", [1]), # check that only unique SMILES are used
         ("rdkit", "partial_path", [2, 4]), # checks partial PATHs
@@ -706,7 +720,7 @@ def test_csearch_rdkit_parameters(
             False,
             1
         ),
-        (
+        pytest.param(
             "rdkit",
             "rule_IrSP.csv",
             "rule_IrSP",
@@ -720,7 +734,8 @@ def test_csearch_rdkit_parameters(
             1,
             None,
             False,
-            3
+            3,
+            marks=pytest.mark.slow,
         ),
 
         # compatibility of CREST with metal complexes and templates
@@ -1049,14 +1064,7 @@ def test_csearch_methods(
                 assert line.find('--chrg 0 --uhf 0') > -1
                 break
         # check that the conformers are sorted by their number (avoid going from 1 to 10 instead of to 2)
-        outfile_sdf = open(sdf_crest, "r")
-        outlines_sdf = outfile_sdf.readlines()
-        outfile_sdf.close()
-        sdf_energies = []
-        for i,line in enumerate(outlines_sdf):
-            if line.startswith('>  <Energy>'):
-                # check if the crest_keywords option works
-                sdf_energies.append(float(outlines_sdf[i+1].split()[0]))
+        sdf_energies = read_sdf_energies(sdf_crest)
         assert len(sdf_energies) > 10
         assert sdf_energies == sorted(sdf_energies)
 
@@ -1072,14 +1080,7 @@ def test_csearch_methods(
                 cregen_found = True
         assert cregen_found
         # check that the conformers are sorted by their energ
-        outfile_sdf = open(sdf_crest, "r")
-        outlines_sdf = outfile_sdf.readlines()
-        outfile_sdf.close()
-        sdf_energies = []
-        for i,line in enumerate(outlines_sdf):
-            if line.startswith('>  <Energy>'):
-                # check if the crest_keywords option works
-                sdf_energies.append(float(outlines_sdf[i+1].split()[0]))
+        sdf_energies = read_sdf_energies(sdf_crest)
         assert len(sdf_energies) > 10
         assert sdf_energies == sorted(sdf_energies)
 
@@ -1118,14 +1119,7 @@ def test_csearch_methods(
         assert butina_found
         assert cregen_clust_found
         # check that the conformers are sorted by their number (avoid going from 1 to 10 instead of to 2)
-        outfile_sdf = open(sdf_crest, "r")
-        outlines_sdf = outfile_sdf.readlines()
-        outfile_sdf.close()
-        sdf_energies = []
-        for i,line in enumerate(outlines_sdf):
-            if line.startswith('>  <Energy>'):
-                # check if the crest_keywords option works
-                sdf_energies.append(float(outlines_sdf[i+1].split()[0]))
+        sdf_energies = read_sdf_energies(sdf_crest)
         assert len(sdf_energies) == 17
         assert sdf_energies == sorted(sdf_energies)
     
@@ -1192,6 +1186,57 @@ def test_csearch_methods(
     os.chdir(w_dir_main)
 
 
+# tests that the stereochemistry from the SMILES survives the parsing in smi_to_mol()
+@pytest.mark.parametrize(
+    "smiles, double_bond_stereo, chiral_centers",
+    [
+        ("C/C=C\\CC", [rdkit.Chem.BondStereo.STEREOZ], []),
+        ("C/C=C/CC", [rdkit.Chem.BondStereo.STEREOE], []),
+        ("C[C@H](O)CC", [], [(1, "S")]),
+        # invalid chiral tags in atoms that are not stereocenters are removed
+        ("C[C@H](C)CC", [], []),
+    ],
+)
+def test_smi_to_mol_stereo(smiles, double_bond_stereo, chiral_centers):
+    mol = smi_to_mol(smiles, "rdkit", None, 62609, [], [], [], [])[0]
+
+    assert [
+        bond.GetStereo()
+        for bond in mol.GetBonds()
+        if bond.GetBondType() == rdkit.Chem.BondType.DOUBLE
+    ] == double_bond_stereo
+    assert rdkit.Chem.FindMolChiralCenters(mol) == chiral_centers
+    assert all(
+        atom.GetChiralTag() == rdkit.Chem.ChiralType.CHI_UNSPECIFIED
+        for atom in mol.GetAtoms()
+        if atom.GetIdx() not in [idx for idx, _ in chiral_centers]
+    )
+
+
+# tests that the geom rules are checked with the geometry of each conformer, so some
+# conformers pass and others are discarded (only gauche(+) butane has a CCCC dihedral of 60 +- 30)
+def test_csearch_geom_rule_some_pass():
+    os.chdir(csearch_rdkit_summ_dir)
+    csearch(
+        w_dir_main=csearch_rdkit_summ_dir,
+        program="rdkit",
+        smi="CCCC",
+        name="butane_geom",
+        geom=["CCCC", 60],
+    )
+
+    mols = rdkit.Chem.SDMolSupplier(
+        "CSEARCH/butane_geom_rdkit.sdf", removeHs=False
+    )
+    assert len(mols) == 1
+    for mol in mols:
+        dihedral = rdMolTransforms.GetDihedralDeg(
+            mol.GetConformer(), 0, 1, 2, 3
+        )
+        assert 30 <= dihedral <= 90
+    os.chdir(w_dir_main)
+
+
 # tests for removing foler
 @pytest.mark.parametrize(
     "folder_list, file_list",
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+######################################################.
+# 		        Testing with pytest: 	             #
+#                  Conformer filters                 #
+######################################################.
+
+import numpy as np
+import pytest
+from rdkit import Chem
+from rdkit.Chem import AllChem, rdMolAlign
+from aqme.filter import RMSD_and_E_filter, batch_rmsd, get_rms_coords
+
+
+class FakeLog:
+    def write(self, message):
+        pass
+
+
+class FakeArgs:
+    energy_threshold = 0.25
+    rms_threshold = 0.25
+    max_matches_rmsd = 1000
+    heavyonly = False
+    log = FakeLog()
+
+
+def embed_confs(smi, n_confs):
+    mol = Chem.AddHs(Chem.MolFromSmiles(smi))
+    cids = list(AllChem.EmbedMultipleConfs(mol, n_confs, randomSeed=42))
+    return mol, cids
+
+
+# the batched Kabsch RMSD must match the RDKit alignment with the same atom numbering
+@pytest.mark.parametrize("smi", ["CCCCC", "OCC(=O)N", "c1ccccc1CO"])
+def test_batch_rmsd(smi):
+    mol, cids = embed_confs(smi, 6)
+    rms_rows, rms_coords, _ = get_rms_coords(
+        {cid: mol for cid in cids}, cids, False, "rdkit"
+    )
+    atom_map = [(i, i) for i in range(mol.GetNumAtoms())]
+
+    rms_batch = batch_rmsd(rms_coords[[rms_rows[cid] for cid in cids[1:]]], rms_coords[rms_rows[cids[0]]])
+
+    for cid, rms in zip(cids[1:], rms_batch):
+        rms_rdkit = rdMolAlign.AlignMol(
+            Chem.Mol(mol), mol, prbCid=cid, refCid=cids[0], atomMap=atom_map
+        )
+        assert rms == pytest.approx(rms_rdkit, abs=1e-6)
+
+
+# the singular-value bound used to skip pairs is a lower bound of the best RMSD
+@pytest.mark.parametrize("smi", ["CCCCC", "O=C([O-])CC(=O)[O-]", "CC(C)(C)O"])
+@pytest.mark.parametrize("heavy", [True, False])
+def test_svals_lower_bound(smi, heavy):
+    mol, cids = embed_confs(smi, 6)
+    rms_rows, rms_coords, rms_svals = get_rms_coords(
+        {cid: mol for cid in cids}, cids, heavy, "rdkit"
+    )
+    sqrt_n_atoms = np.sqrt(rms_coords.shape[1])
+    prb_mol, ref_mol = Chem.Mol(mol), Chem.Mol(mol)
+    if heavy:
+        prb_mol, ref_mol = Chem.RemoveHs(prb_mol), Chem.RemoveHs(ref_mol)
+
+    for i, cid_1 in enumerate(cids):
+        for cid_2 in cids[i + 1:]:
+            rms_lower_bound = np.linalg.norm(rms_svals[rms_rows[cid_1]] - rms_svals[rms_rows[cid_2]]) / sqrt_n_atoms
+            rms_best = rdMolAlign.GetBestRMS(prb_mol, ref_mol, cid_1, cid_2)
+            assert rms_lower_bound <= rms_best + 1e-6
+
+
+# conformers with different bonds (here, the acidic H bonded to the other O atom) can't be
+# found as duplicates with the original atom numbering, only through get_conf_RMS
+def test_RMSD_and_E_filter_different_topology():
+    mol_1 = Chem.AddHs(Chem.MolFromSmiles("CC(=O)O"))
+    AllChem.EmbedMolecule(mol_1, randomSeed=42)
+    # same coordinates but the H of the carboxylic acid is bonded to the C=O oxygen
+    rwmol = Chem.RWMol(mol_1)
+    rwmol.RemoveBond(3, 7)
+    rwmol.AddBond(2, 7, Chem.BondType.SINGLE)
+    rwmol.GetBondBetweenAtoms(1, 2).SetBondType(Chem.BondType.SINGLE)
+    rwmol.GetBondBetweenAtoms(1, 3).SetBondType(Chem.BondType.DOUBLE)
+    mol_2 = rwmol.GetMol()
+    Chem.SanitizeMol(mol_2)
+
+    selectedcids = RMSD_and_E_filter([mol_1, mol_2], [0, 1], [0.0, 0.1], FakeArgs(), "summ")
+
+    assert selectedcids == [0, 1]
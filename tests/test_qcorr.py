@@ -12,6 +12,9 @@ import shutil
 import subprocess
 from pathlib import Path
 import pandas as pd
+import numpy as np
+from aqme.qcorr import qcorr
+from aqme.qcorr_utils import check_isomerization, gen_connectivity
 
 # saves the working directory
 path_main = os.getcwd()
@@ -983,3 +986,63 @@ def test_QCORR_analysis(init_folder, file, command_line, target_folder, restore_
         for dat_file in dat_files:
             if "QCORR" in dat_file:
                 os.remove(dat_file)
+
+
+# the isomerization check takes the connectivity and TS atoms from the row of the initial CSV
+# with the same code_name (here, the second row)
+@pytest.mark.parametrize(
+    "coords_output, ts_atom_idx, isomerized",
+    [
+        # same geometry as the input
+        ([[0.0, 0.0, 0.0], [0.96, 0.0, 0.0], [-0.24, 0.93, 0.0]], "0,1", False),
+        # the O-H bond that breaks is part of the TS
+        ([[0.0, 0.0, 0.0], [3.0, 0.0, 0.0], [-0.24, 0.93, 0.0]], "0,1", False),
+        # the O-H bond that breaks isn't part of the TS
+        ([[0.0, 0.0, 0.0], [3.0, 0.0, 0.0], [-0.24, 0.93, 0.0]], "0,2", True),
+    ],
+)
+def test_check_isomerization_csv(coords_output, ts_atom_idx, isomerized):
+    atoms = ["O", "H", "H"]
+    coords_input = [[0.0, 0.0, 0.0], [0.96, 0.0, 0.0], [-0.24, 0.93, 0.0]]
+    isom_data = {
+        "VdW radii fraction": 0.5,
+        "Covalent radii fraction": 1.1,
+    }
+    init_connectivity = gen_connectivity(isom_data, atoms, coords_input)
+    other_connectivity = np.zeros((2, 2))
+    isom_data["Initial csv"] = pd.DataFrame(
+        {
+            "code_name": ["other_mol", "H2O"],
+            "initial_connectiv": [str(other_connectivity), str(init_connectivity)],
+            "TS_atom_idx": ["0,1", ts_atom_idx],
+        }
+    )
+    isom_data["Atoms output"] = atoms
+    isom_data["Coords output"] = coords_output
+
+    assert check_isomerization(isom_data, "H2O_1.log") == isomerized
+
+
+# outputs that cclib can't parse (here, a Gaussian output cut before the first geometry) are
+# moved to the no_data folder and the cclib error is printed only once
+def test_QCORR_cclib_error():
+    w_dir_main = f"{path_main}/tests/qcorr_cclib"
+    os.makedirs(w_dir_main, exist_ok=True)
+    shutil.copy(f"{path_qcorr}/QCORR_1/CH4.log", w_dir_main)
+    with open(f"{path_qcorr}/QCORR_1/CH4.log", "r") as log_file:
+        outlines = log_file.readlines()
+    with open(f"{w_dir_main}/Broken_CH4.log", "w") as log_file:
+        log_file.writelines(outlines[:100])
+
+    os.chdir(w_dir_main)
+    qcorr(files=f"{w_dir_main}/*.log", w_dir_main=w_dir_main)
+
+    assert path.exists(f"{w_dir_main}/failed/run_1/error/no_data/Broken_CH4.log")
+    assert path.exists(f"{w_dir_main}/success/CH4.log")
+    with open(f"{w_dir_main}/QCORR-run_1.dat", "r") as datfile:
+        datlines = datfile.readlines()
+    cclib_errors = [line for line in datlines if "cclib couldn't process Broken_CH4.log" in line]
+    assert len(cclib_errors) == 1
+
+    os.chdir(path_main)
+    shutil.rmtree(w_dir_main)
@@ -11,6 +11,7 @@ import pytest
 import shutil
 import subprocess
 from pathlib import Path
+from aqme.qprep import qprep
 
 # saves the working directory
 path_main = os.getcwd()
@@ -141,13 +142,14 @@ def test_QPREP_analysis(test_type, init_folder, target_folder, restore_folder):
             assert len(glob.glob(f"{w_dir_main}/*.sdf")) == 0
 
         for file in files_assert:
-            assert path.exists(f'{destination}/{file.split(".")[0]}.com')
+            name = file.split(".")[0]
+            assert path.exists(f'{destination}/{name}.com')
 
-            outfile = open(f'{destination}/{file.split(".")[0]}.com', "r")
+            outfile = open(f'{destination}/{name}.com', "r")
             outlines = outfile.readlines()
             outfile.close()
  
-            if file.split(".")[0] == "H_freq":
+            if name == "H_freq":
                 line_6 = "0 2"
                 line_7 = "H   0.00000000   0.00000000   0.00000000"
 
@@ -157,35 +159,35 @@ def test_QPREP_analysis(test_type, init_folder, target_folder, restore_folder):
                 # ensure that QPREP applies the correct structural distortions to the errored calcs
                 line_6 = "0 1"
 
-                if file.split(".")[0] == "CH4":
+                if name == "CH4":
                     line_8 = "H   0.45703600  -0.46392100  -0.87651000"
                     line_10 = "H   0.29552000   1.04984200   0.05078900"
 
-                elif file.split(".")[0] == "MeOH_NMR":
+                elif name == "MeOH_NMR":
                     line_8 = "H  -1.08592900   0.98379700  -0.00000100"
                     line_10 = "H  -1.02538000  -0.54454000  -0.88941000"
 
-                elif file.split(".")[0] == "quinine_rdkit_conf_1":
+                elif name == "quinine_rdkit_conf_1":
                     line_8 = "O   2.93580000   2.55850000   2.17990000"
                     line_10 = "C   2.26850000   1.23230000   0.38520000"
 
-                elif file.split(".")[0] == "quinine_rdkit_conf_10":
+                elif name == "quinine_rdkit_conf_10":
                     line_8 = "O   3.23820000   2.67370000  -1.56720000"
                     line_10 = "C   2.35510000   0.65880000  -0.80190000"
                     assert (
                         len(glob.glob(f"{destination}/quinine_rdkit_conf_*.com")) == 10
                     )
 
-                elif file.split(".")[0] == "Int-I_conf_1":
+                elif name == "Int-I_conf_1":
                     line_8 = "C   3.74440000  -1.75670000   0.37800000"
                     line_10 = "H   3.38180000  -1.72450000   1.40790000"
 
-                elif file.split(".")[0] == "Int-I_conf_3":
+                elif name == "Int-I_conf_3":
                     line_8 = "C   3.59790000  -2.21510000   0.62110000"
                     line_10 = "H   2.68030000  -2.43910000   1.16970000"
                     assert len(glob.glob(f"{destination}/Int-I_conf_*.com")) == 3
 
-                elif file.split(".")[0] == "7ac8_chainsEF_conf_1":
+                elif name == "7ac8_chainsEF_conf_1":
                     line_8 = "C   5.61200000 -38.15900000   9.29600000"
                     line_10 = "O   5.88600000 -40.54700000   9.19200000"
 
@@ -215,21 +217,22 @@ def test_QPREP_analysis(test_type, init_folder, target_folder, restore_folder):
             files_assert = ["Int-I_charged_conf_1.com", "Int-I_charged_conf_3.com"]
 
         for file in files_assert:
-            outfile = open(f'{destination}/{file.split(".")[0]}.com', "r")
+            name = file.split(".")[0]
+            outfile = open(f'{destination}/{name}.com', "r")
             outlines = outfile.readlines()
             outfile.close()
 
-            if file.split(".")[0] == "MeOH_NMR_charged":
+            if name == "MeOH_NMR_charged":
                 line_6 = "2 3"
-            elif file.split(".")[0] == "CH4_charged":
+            elif name == "CH4_charged":
                 line_6 = "2 3"
-            elif file.split(".")[0] == "quinine_rdkit_charged_conf_1":
+            elif name == "quinine_rdkit_charged_conf_1":
                 line_6 = "2 3"
-            elif file.split(".")[0] == "quinine_rdkit_charged_conf_10":
+            elif name == "quinine_rdkit_charged_conf_10":
                 line_6 = "4 5"
-            elif file.split(".")[0] == "Int-I_charged_conf_1":
+            elif name == "Int-I_charged_conf_1":
                 line_6 = "2 3"
-            elif file.split(".")[0] == "Int-I_charged_conf_3":
+            elif name == "Int-I_charged_conf_3":
                 line_6 = "4 5"
 
             assert outlines[6].strip() == line_6
@@ -597,3 +600,61 @@ def test_QPREP_analysis(test_type, init_folder, target_folder, restore_folder):
         for dat_file in dat_files:
             if "QPREP" in dat_file:
                 os.remove(dat_file)
+
+
+# %maxcore of ORCA inputs is written in MB (GB are converted, in any case)
+@pytest.mark.parametrize(
+    "mem, line_maxcore",
+    [
+        ("4GB", "%maxcore 4000"),
+        ("4gb", "%maxcore 4000"),
+        ("2.5GB", "%maxcore 2500"),
+        ("4000MB", "%maxcore 4000"),
+        ("4000", "%maxcore 4000"),
+    ],
+)
+def test_QPREP_orca_maxcore(tmp_path, mem, line_maxcore):
+    qprep(
+        files=f"{path_qprep}/log_files/CH4.log",
+        destination=tmp_path,
+        program="orca",
+        qm_input="B3LYP def2-SVP",
+        mem=mem,
+        create_dat=False,
+    )
+
+    outfile = open(f"{tmp_path}/CH4.inp", "r")
+    outlines = outfile.readlines()
+    outfile.close()
+
+    assert outlines[1].strip() == line_maxcore
+
+
+# the %pal block is not added when the number of processors is set in qm_input (i.e. PAL2)
+@pytest.mark.parametrize(
+    "qm_input, pal_written",
+    [
+        ("B3LYP def2-SVP PAL2", False),
+        ("B3LYP def2-SVP pal8", False),
+        ("B3LYP def2-SVP", True),
+    ],
+)
+def test_QPREP_orca_pal(tmp_path, qm_input, pal_written):
+    qprep(
+        files=f"{path_qprep}/log_files/CH4.log",
+        destination=tmp_path,
+        program="orca",
+        qm_input=qm_input,
+        nprocs=4,
+        create_dat=False,
+    )
+
+    outfile = open(f"{tmp_path}/CH4.inp", "r")
+    outlines = outfile.readlines()
+    outfile.close()
+
+    pal_lines = [line for line in outlines if line.strip().startswith("%pal")]
+    if pal_written:
+        assert pal_lines == ["%pal nprocs 4 end\n"]
+    else:
+        assert pal_lines == []
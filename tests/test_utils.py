@@ -1,5 +1,7 @@
 import pytest
-from aqme.utils import check_run
+from rdkit import Chem
+from rdkit.Chem import AllChem
+from aqme.utils import check_run, read_sdf_tags, get_info_input, get_conf_RMS, get_rms_maps
 
 
 class FakePath:
@@ -77,4 +79,50 @@ def test_check_run(
             w_dir=w_dir
         )
     except UnboundLocalError as e:
-        pytest.fail(f":: {e}")
\ No newline at end of file
+        pytest.fail(f":: {e}")
+
+def test_read_sdf_tags(tmp_path):
+    sdf_file = tmp_path / "tags.sdf"
+    sdf_file.write_text(
+        "mol_1\n\n\n"
+        ">  <Real charge>\n1\n\n>  <Mult>\n2\n\n>  <ID>\nmol 1\n\n$$$$\n"
+        "mol_2\n\n\n"
+        ">  <Real charge>\n-1\n\n>  <Mult>\n1\n\n>  <ID>\nmol 2\n\n$$$$\n"
+    )
+
+    sdf_tags = read_sdf_tags(sdf_file, ["Real charge", "Mult", "ID", "Energy"])
+
+    assert sdf_tags["Real charge"] == ["1", "-1"]
+    assert sdf_tags["Mult"] == ["2", "1"]
+    assert sdf_tags["ID"] == ["mol 1", "mol 2"]
+    assert sdf_tags["Energy"] == []
+
+def test_get_info_input_orca(tmp_path):
+    inp_file = tmp_path / "mol_1.inp"
+    inp_file.write_text(
+        "! B3LYP def2-SVP\n"
+        "%maxcore 2000\n"
+        "* xyz -1 2\n"
+        "C 0.0 0.0 0.0\n"
+        "O 0.0 0.0 1.2\n"
+        "*\n"
+    )
+
+    atoms_and_coords, charge, mult = get_info_input(inp_file)
+
+    assert atoms_and_coords == ["C 0.0 0.0 0.0", "O 0.0 0.0 1.2"]
+    assert charge == "-1"
+    assert mult == "2"
+
+
+@pytest.mark.parametrize("smi", ["O=C([O-])CC(=O)[O-]", "c1ccccc1[N+](=O)[O-]", "CC(C)(C)O"])
+@pytest.mark.parametrize("heavy", [True, False])
+def test_get_rms_maps(smi, heavy):
+    mol = Chem.AddHs(Chem.MolFromSmiles(smi))
+    cids = list(AllChem.EmbedMultipleConfs(mol, 4, randomSeed=42))
+    rms_maps = get_rms_maps(mol, heavy, 1000)
+
+    for cid in cids[1:]:
+        rms = get_conf_RMS(Chem.Mol(mol), mol, cids[0], cid, heavy, 1000)
+        rms_cached = get_conf_RMS(Chem.Mol(mol), mol, cids[0], cid, heavy, 1000, rms_maps=rms_maps)
+        assert rms_cached == pytest.approx(rms)